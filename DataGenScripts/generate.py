@@ -0,0 +1,233 @@
+"""Vectorized synthetic login generator for scale testing.
+
+Produces the same shape of data as the variation.py -> variation2.py ->
+variation3.py -> variation4.py -> variationanomalous.py chain, for any number
+of users and without intermediate files:
+
+- a base login per user, drawn from the TIMEZONE_MAPPING boxes and
+  devicetypes;
+- five derived normal logins, with the same perturbations as variation,
+  variation2 (twice), variation3 and variation4;
+- one anomalous login per user, as variationanomalous makes it.
+
+Each user's six normal logins are written in LoginTime order. All the
+anomalous logins follow at the end of the file, as in
+useractivityvariation5.csv; sweep.py relies on that layout for its labels.
+
+Users are generated in fixed-size shards, each with its own child of one
+SeedSequence. The output depends only on --seed and --users, not on
+--workers. Shards are generated in parallel into part files, then
+concatenated in order.
+
+Run: python DataGenScripts/generate.py --users 1000000 --output useractivity_1m.csv
+"""
+import argparse
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from variation3 import TIMEZONE_MAPPING as VARIATION_TIMEZONE_MAPPING
+from variationanomalous import TIMEZONE_MAPPING, devicetypes
+
+COLUMNS = ["userID", "IPaddress", "Timezone", "Latitude", "Longitude", "DeviceInfo", "TypingSpeed", "MouseSpeed", "LoginTime"]
+TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# TIMEZONE_MAPPING flattened: one row per zone, in dict order
+CONTINENTS = list(TIMEZONE_MAPPING)
+ZONE_NAMES = np.array([zone for zones in TIMEZONE_MAPPING.values() for zone in zones])
+ZONE_BOXES = np.array([box for zones in TIMEZONE_MAPPING.values() for box in zones.values()])
+ZONE_CONTINENTS = np.array([c for c, zones in enumerate(TIMEZONE_MAPPING.values()) for _ in zones])
+DEVICES = np.array(devicetypes)
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=10000, help="Synthetic users (7 logins each)")
+    parser.add_argument("--output", default="useractivity_synthetic.csv", help="CSV, or .parquet (needs pyarrow)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--shard-users", type=int, default=50000, help="Users per shard (changes the output)")
+    parser.add_argument("--first-user-id", type=int, default=100000)
+    parser.add_argument("--start", default="2025-03-01", help="Base logins fall in [start, start + days)")
+    parser.add_argument("--days", type=float, default=30)
+    return parser.parse_args(argv)
+
+def ip_strings(rng, n):
+    ips = rng.integers(0, 2**32, n, dtype=np.uint64)
+    octets = [((ips >> shift) & 255).astype(str) for shift in (24, 16, 8, 0)]
+    return octets[0] + "." + octets[1] + "." + octets[2] + "." + octets[3]
+
+def jitter(rng, values, low, high):
+    return values + np.round(rng.uniform(low, high, len(values)), 6)
+
+def randint(rng, low, high, n):
+    # Inclusive bounds, as random.randint
+    return rng.integers(low, high + 1, n)
+
+def seconds(values):
+    return values.astype("timedelta64[s]")
+
+def base_logins(rng, n, start, days):
+    zone = rng.integers(0, len(ZONE_NAMES), n)
+    lat_min, lat_max, lon_min, lon_max = ZONE_BOXES[zone].T
+    return {
+        "IPaddress": ip_strings(rng, n),
+        "Timezone": ZONE_NAMES[zone],
+        "Latitude": np.round(rng.uniform(lat_min, lat_max), 6),
+        "Longitude": np.round(rng.uniform(lon_min, lon_max), 6),
+        "DeviceInfo": DEVICES[rng.integers(0, len(DEVICES), n)],
+        "TypingSpeed": randint(rng, 10, 200, n),
+        "MouseSpeed": np.round(rng.uniform(200, 2000, n), 1),
+        "LoginTime": start + seconds(rng.uniform(0, days * 86400, n))
+    }
+
+# variation.introducevariation
+def minor_variation(rng, row):
+    n = len(row["Latitude"])
+    return dict(row,
+                Latitude=jitter(rng, row["Latitude"], -0.05, 0.05),
+                Longitude=jitter(rng, row["Longitude"], -0.05, 0.05),
+                TypingSpeed=np.clip(row["TypingSpeed"] + randint(rng, -5, 5, n), 10, 200),
+                MouseSpeed=np.clip(row["MouseSpeed"] + randint(rng, -50, 50, n), 200, 2000),
+                LoginTime=row["LoginTime"] + seconds(3600 * randint(rng, 1, 3, n) + randint(rng, -60, 60, n)))
+
+# variation2.majorvariation
+def major_variation(rng, row):
+    n = len(row["Latitude"])
+    return dict(row,
+                IPaddress=ip_strings(rng, n),
+                DeviceInfo=DEVICES[rng.integers(0, len(DEVICES), n)],
+                Latitude=jitter(rng, row["Latitude"], -6, 6),
+                Longitude=jitter(rng, row["Longitude"], -6, 6),
+                LoginTime=row["LoginTime"] + seconds(2 * 86400 + 3600 * randint(rng, -8, 8, n)),
+                TypingSpeed=np.clip(row["TypingSpeed"] + randint(rng, -12, 12, n), 10, 200),
+                MouseSpeed=np.clip(row["MouseSpeed"] + randint(rng, -120, 120, n), 200, 2000))
+
+def first_containing(boxes, lat, lon):
+    """Index of the first box containing each point, or -1."""
+    found = np.full(len(lat), -1)
+    for k, (lat_min, lat_max, lon_min, lon_max) in reversed(list(enumerate(boxes))):
+        found[(lat_min <= lat) & (lat <= lat_max) & (lon_min <= lon) & (lon <= lon_max)] = k
+    return found
+
+# variation3.generate_variation / variation4.generate_variation
+def travel_variation(rng, row):
+    n = len(row["Latitude"])
+    zones = [zone for zones in VARIATION_TIMEZONE_MAPPING.values() for zone in zones]
+    continent = first_containing([box for zones in VARIATION_TIMEZONE_MAPPING.values() for box in zones.values()],
+                                 row["Latitude"], row["Longitude"])
+    return dict(row,
+                IPaddress=ip_strings(rng, n),
+                DeviceInfo=DEVICES[rng.integers(0, len(DEVICES), n)],
+                Latitude=jitter(rng, row["Latitude"], -6, 6),
+                Longitude=jitter(rng, row["Longitude"], -10, 10),
+                # Each continent there has one zone; points outside every box count as Asia
+                Timezone=np.array(zones)[np.maximum(continent, 0)],
+                LoginTime=row["LoginTime"] + seconds(86400 * randint(rng, 2, 4, n) + 3600 * randint(rng, -6, 6, n)),
+                TypingSpeed=np.clip(row["TypingSpeed"] + randint(rng, -15, 15, n), 10, 200),
+                MouseSpeed=np.clip(row["MouseSpeed"] + randint(rng, -150, 150, n), 200, 2000))
+
+# variationanomalous.generate_entry: a login from a zone on another continent
+def anomalous_variation(rng, row):
+    n = len(row["Latitude"])
+    match = first_containing(ZONE_BOXES, row["Latitude"], row["Longitude"])
+    old = np.where(match >= 0, ZONE_CONTINENTS[match], -1)
+    # Uniform over the other continents (all of them when none matched)
+    pick = np.where(old >= 0, rng.integers(0, len(CONTINENTS) - 1, n), rng.integers(0, len(CONTINENTS), n))
+    continent = np.where((old >= 0) & (pick >= old), pick + 1, pick)
+    zone_counts = np.bincount(ZONE_CONTINENTS)
+    zone_starts = np.concatenate([[0], np.cumsum(zone_counts)[:-1]])
+    zone = zone_starts[continent] + (rng.random(n) * zone_counts[continent]).astype(np.int64)
+    lat_min, lat_max, lon_min, lon_max = ZONE_BOXES[zone].T
+    return dict(row,
+                Latitude=np.round(rng.uniform(lat_min, lat_max), 6),
+                Longitude=np.round(rng.uniform(lon_min, lon_max), 6),
+                Timezone=ZONE_NAMES[zone],
+                IPaddress=ip_strings(rng, n),
+                DeviceInfo=DEVICES[rng.integers(0, len(DEVICES), n)],
+                LoginTime=row["LoginTime"] + seconds(86400 * randint(rng, -1, 1, n) + 3600 * randint(rng, -6, 6, n)),
+                TypingSpeed=randint(rng, 10, 200, n),
+                MouseSpeed=randint(rng, 200, 2000, n))
+
+def generate_shard(seed_sequence, user_ids, start, days):
+    """Returns (normal, anomalous) frames for one shard of users."""
+    rng = np.random.default_rng(seed_sequence)
+    n = len(user_ids)
+    r0 = base_logins(rng, n, start, days)
+    r1 = minor_variation(rng, r0)
+    rows = [r0, major_variation(rng, r0), r1, major_variation(rng, r1)]
+    rows.append(travel_variation(rng, rows[3]))
+    rows.append(travel_variation(rng, rows[4]))
+    anomalous = anomalous_variation(rng, rows[-1])
+
+    normal = pd.concat([pd.DataFrame(dict(row, userID=user_ids), columns=COLUMNS) for row in rows], ignore_index=True)
+    # Row k of round r is user k: order per user, then by LoginTime within the user
+    normal["user"] = np.tile(np.arange(n), len(rows))
+    normal = normal.sort_values(["user", "LoginTime"], kind="stable").drop(columns="user")
+    return normal, pd.DataFrame(dict(anomalous, userID=user_ids), columns=COLUMNS)
+
+def write_part(frame, path):
+    if path.endswith(".parquet"):
+        # Anomalous MouseSpeed is drawn as integers; every part needs one schema
+        frame.astype({"MouseSpeed": np.float64}).to_parquet(path, index=False)
+    else:
+        frame.to_csv(path, index=False, header=False, date_format=TIME_FORMAT)
+
+def run_shard(job):
+    shard, seed_sequence, user_ids, start, days, parts_dir, suffix = job
+    normal, anomalous = generate_shard(seed_sequence, user_ids, start, days)
+    write_part(normal, os.path.join(parts_dir, f"normal-{shard:05d}{suffix}"))
+    write_part(anomalous, os.path.join(parts_dir, f"anomalous-{shard:05d}{suffix}"))
+    return len(normal) + len(anomalous)
+
+def merge_parts(paths, output, parquet):
+    """Concatenate the shard parts into `output`. The format is passed in,
+    since the temporary output name does not end in the final suffix."""
+    if parquet:
+        # pyarrow is only needed for Parquet output
+        import pyarrow.parquet as pq
+        writer = None
+        for path in paths:
+            table = pq.read_table(path)
+            writer = writer or pq.ParquetWriter(output, table.schema)
+            writer.write_table(table)
+        if writer is not None:
+            writer.close()
+        return
+    with open(output, "w", newline="", encoding="utf-8") as outfile:
+        outfile.write(",".join(COLUMNS) + "\n")
+        for path in paths:
+            with open(path, encoding="utf-8") as infile:
+                shutil.copyfileobj(infile, outfile, 1 << 20)
+
+def main(argv=None):
+    args = parse_args(argv)
+    start_time = time.perf_counter()
+    suffix = ".parquet" if args.output.endswith(".parquet") else ".csv"
+    parts_dir = f"{args.output}.parts"
+    os.makedirs(parts_dir, exist_ok=True)
+
+    shards = range(0, args.users, args.shard_users)
+    seeds = np.random.SeedSequence(args.seed).spawn(len(shards))
+    start = np.datetime64(args.start, "s")
+    jobs = [(shard, seed, np.arange(lo, min(lo + args.shard_users, args.users)) + args.first_user_id, start, args.days, parts_dir, suffix)
+            for shard, (lo, seed) in enumerate(zip(shards, seeds))]
+    try:
+        if args.workers <= 1:
+            rows = sum(map(run_shard, jobs))
+        else:
+            with ProcessPoolExecutor(max_workers=args.workers) as pool:
+                rows = sum(pool.map(run_shard, jobs))
+        paths = [os.path.join(parts_dir, f"{kind}-{shard:05d}{suffix}") for kind in ("normal", "anomalous") for shard in range(len(jobs))]
+        tmp_path = f"{args.output}.tmp"
+        merge_parts(paths, tmp_path, suffix == ".parquet")
+        os.replace(tmp_path, args.output)
+    finally:
+        shutil.rmtree(parts_dir, ignore_errors=True)
+
+    elapsed = time.perf_counter() - start_time
+    print(f"✅ {rows} logins for {args.users} users written to {args.output} in {elapsed:.1f}s ({rows / elapsed:,.0f} rows/s)")
+
+if __name__ == '__main__':
+    main()
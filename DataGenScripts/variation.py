@@ -23,14 +23,18 @@ def introducevariation(row):
 
     return rowcopy
 
-with open(inputcsv, mode='r', encoding='utf-8') as infile, open(outputcsv, mode='w', newline='', encoding='utf-8') as outfile:
-    reader = csv.DictReader(infile)
-    writer = csv.DictWriter(outfile, fieldnames=reader.fieldnames)
-    writer.writeheader()
+def main():
+    with open(inputcsv, mode='r', encoding='utf-8') as infile, open(outputcsv, mode='w', newline='', encoding='utf-8') as outfile:
+        reader = csv.DictReader(infile)
+        writer = csv.DictWriter(outfile, fieldnames=reader.fieldnames)
+        writer.writeheader()
 
-    for row in reader:
-        writer.writerow(row)
-        modifiedrow = introducevariation(row)
-        writer.writerow(modifiedrow)
+        for row in reader:
+            writer.writerow(row)
+            modifiedrow = introducevariation(row)
+            writer.writerow(modifiedrow)
 
-print('CSV file created with variation')
+    print('CSV file created with variation')
+
+if __name__ == '__main__':
+    main()
@@ -54,27 +54,31 @@ def generate_variation(row):
 
     return rowcopy
 
-# Dictionary to store rows for each user
-users_data = defaultdict(list)
-
-with open(inputcsv, mode='r', encoding='utf-8') as infile:
-    reader = csv.DictReader(infile)
-    for row in reader:
-        user_id = row['userID']  # Change to appropriate column name if needed
-        users_data[user_id].append(row)
-
-with open(outputcsv, mode='w', newline='', encoding='utf-8') as outfile:
-    writer = csv.DictWriter(outfile, fieldnames=reader.fieldnames)
-    writer.writeheader()
-
-    for user_id, rows in users_data.items():
-        # Keep the first 4 rows for each user unchanged
-        for i in range(min(4, len(rows))):
-            writer.writerow(rows[i])
-
-        # Generate one new row from the 4th row (if available)
-        if len(rows) >= 4:
-            new_row = generate_variation(rows[3])
-            writer.writerow(new_row)
-
-print('CSV file created with 1 new variation per user.')
+def main():
+    # Dictionary to store rows for each user
+    users_data = defaultdict(list)
+
+    with open(inputcsv, mode='r', encoding='utf-8') as infile:
+        reader = csv.DictReader(infile)
+        for row in reader:
+            user_id = row['userID']  # Change to appropriate column name if needed
+            users_data[user_id].append(row)
+
+    with open(outputcsv, mode='w', newline='', encoding='utf-8') as outfile:
+        writer = csv.DictWriter(outfile, fieldnames=reader.fieldnames)
+        writer.writeheader()
+
+        for user_id, rows in users_data.items():
+            # Keep the first 4 rows for each user unchanged
+            for i in range(min(4, len(rows))):
+                writer.writerow(rows[i])
+
+            # Generate one new row from the 4th row (if available)
+            if len(rows) >= 4:
+                new_row = generate_variation(rows[3])
+                writer.writerow(new_row)
+
+    print('CSV file created with 1 new variation per user.')
+
+if __name__ == '__main__':
+    main()
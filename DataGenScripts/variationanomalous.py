@@ -85,34 +85,38 @@ def generate_entry(latest_entry):
 
     return modified_entry
 
-# Read the original CSV and store all entries
-user_entries = {}
-
-with open(inputcsv, mode='r', encoding='utf-8') as infile:
-    reader = csv.DictReader(infile)
-    for row in reader:
-        user_id = row['userID']
-        if user_id not in user_entries:
-            user_entries[user_id] = []
-        user_entries[user_id].append(row)
-
-# Keep only the latest 6 entries per user
-filtered_entries = []
-for user_id, entries in user_entries.items():
-    entries = sorted(entries, key=lambda x: datetime.strptime(x['LoginTime'], '%Y-%m-%d %H:%M:%S'))  # Sort by LoginTime
-    latest_entries = entries[-6:]  # Keep only last 6
-    filtered_entries.extend(latest_entries)
-
-# Generate one new modified entry per user
-new_entries = [generate_entry(entries[-1]) for user_id, entries in user_entries.items()]
-
-# Write new CSV file
-with open(outputcsv, mode='w', newline='', encoding='utf-8') as outfile:
-    fieldnames = list(filtered_entries[0].keys())  # Get headers from existing data
-    writer = csv.DictWriter(outfile, fieldnames=fieldnames)
-    
-    writer.writeheader()
-    writer.writerows(filtered_entries)  # Write last 6 entries per user
-    writer.writerows(new_entries)  # Append one new generated entry per user
-
-print('✅ New CSV file created with the last 6 entries per user + one new modified entry per user.')
+def main():
+    # Read the original CSV and store all entries
+    user_entries = {}
+
+    with open(inputcsv, mode='r', encoding='utf-8') as infile:
+        reader = csv.DictReader(infile)
+        for row in reader:
+            user_id = row['userID']
+            if user_id not in user_entries:
+                user_entries[user_id] = []
+            user_entries[user_id].append(row)
+
+    # Keep only the latest 6 entries per user
+    filtered_entries = []
+    for user_id, entries in user_entries.items():
+        entries = sorted(entries, key=lambda x: datetime.strptime(x['LoginTime'], '%Y-%m-%d %H:%M:%S'))  # Sort by LoginTime
+        latest_entries = entries[-6:]  # Keep only last 6
+        filtered_entries.extend(latest_entries)
+
+    # Generate one new modified entry per user
+    new_entries = [generate_entry(entries[-1]) for user_id, entries in user_entries.items()]
+
+    # Write new CSV file
+    with open(outputcsv, mode='w', newline='', encoding='utf-8') as outfile:
+        fieldnames = list(filtered_entries[0].keys())  # Get headers from existing data
+        writer = csv.DictWriter(outfile, fieldnames=fieldnames)
+
+        writer.writeheader()
+        writer.writerows(filtered_entries)  # Write last 6 entries per user
+        writer.writerows(new_entries)  # Append one new generated entry per user
+
+    print('✅ New CSV file created with the last 6 entries per user + one new modified entry per user.')
+
+if __name__ == '__main__':
+    main()
@@ -1,85 +1,174 @@
+import argparse
+import os
 import pandas as pd
 import numpy as np
-from sklearn.preprocessing import MinMaxScaler, LabelEncoder
-from sklearn.model_selection import train_test_split
-from sklearn.ensemble import IsolationForest
+from sklearn.preprocessing import MinMaxScaler
 import joblib
 from datetime import datetime
-from geopy.distance import geodesic
-
-# Load dataset
-df = pd.read_csv("useractivityvariation5.csv")
-print(f"✅ Dataset loaded. Shape: {df.shape}")
-
-# Encode categorical features
-label_encoders = {}
-categorical_cols = ["IPaddress", "Timezone", "DeviceInfo"]
-for col in categorical_cols:
-    le = LabelEncoder()
-    df[col] = le.fit_transform(df[col])
-    label_encoders[col] = le
-joblib.dump(label_encoders, "label_encoders.pkl")
-print("✅ Label encoders saved.")
-
-# Compute frequency of each IP address & add as feature
-ip_frequencies = df["IPaddress"].value_counts(normalize=True).to_dict()
-df["ip_frequency"] = df["IPaddress"].map(ip_frequencies)
-joblib.dump(ip_frequencies, "ip_frequencies.pkl")
-
-# Convert `LoginTime` to datetime
-#df["LoginTime"] = pd.to_datetime(df["LoginTime"], format="%d-%m-%Y %H:%M", dayfirst=True, errors="coerce")
-
-df["LoginTime"] = pd.to_datetime(df["LoginTime"], dayfirst=True, errors="coerce")
-
-
-# Sort by userID and LoginTime for sequential processing
-df = df.sort_values(by=["userID", "LoginTime"])
-df["prev_latitude"] = df.groupby("userID")["Latitude"].shift(1)
-df["prev_longitude"] = df.groupby("userID")["Longitude"].shift(1)
-df["prev_login_time"] = df.groupby("userID")["LoginTime"].shift(1)
-
-# Drop NaN values (ensures every entry has a valid previous login)
-df.dropna(inplace=True)
-if df.empty:
-    raise ValueError("Error: The dataset is empty after preprocessing! Check data loading.")
-
-def calculate_speed(row):
-    try:
-        prev_location = (row["prev_latitude"], row["prev_longitude"])
-        current_location = (row["Latitude"], row["Longitude"])
-        
-        if pd.isnull(row["prev_login_time"]) or pd.isnull(row["LoginTime"]):
-            return 0.0
-        
-        time_diff = (row["LoginTime"] - row["prev_login_time"]).total_seconds() / 3600.0
-        distance = geodesic(prev_location, current_location).km
-        
-        return distance / time_diff if time_diff > 0 else 0.0
-    except:
-        return 0.0
-
-df["geo_velocity"] = df.apply(calculate_speed, axis=1)
-print("✅ Geo-velocity computed.")
-
-# Extract login hour
-df["login_hour"] = df["LoginTime"].dt.hour
-
-# Normalize numerical features
-numerical_cols = ["Latitude", "Longitude", "TypingSpeed", "MouseSpeed", "geo_velocity", "login_hour", "ip_frequency"]
-scaler = MinMaxScaler()
-df[numerical_cols] = scaler.fit_transform(df[numerical_cols])
-joblib.dump(scaler, "scaler.pkl")
-print("✅ Numerical features normalized and scaler saved.")
-
-# Prepare training data
-X = df[numerical_cols].values
-if X.shape[0] == 0:
-    raise ValueError("Error: No training data available after preprocessing!")
-
-# Train Isolation Forest model
-iso_forest = IsolationForest(n_estimators=100, contamination=0.14, random_state=42)
-iso_forest.fit(X)
-
-# Save the model
-joblib.dump(iso_forest, "isolation_forest_model.pkl")
-print("✅ Isolation Forest training complete. Model saved successfully!")
\ No newline at end of file
+from geo import GEO_VELOCITY_MODES, geo_velocity, geodesic_km, lambert_km
+from encoding import CategoryLookup
+from ip_sketch import IPFrequencySketch
+from model_bundle import FEATURE_COLUMNS, write_bundle
+from login_history import HISTORY_COLUMNS, history_features
+from feature_store import FEATURE_CACHE_DIR, load_features
+from calibration import ALLOW_PERCENTILE, MFA_PERCENTILE
+from stream_train import LOGIN_TIME_FORMAT, fit_and_calibrate, ip_sketch_params, train_streaming
+
+# Logins per user the history features look back over, as app.py's HISTORY_SIZE
+HISTORY_SIZE = int(os.environ.get("HISTORY_SIZE", 10))
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Train the Isolation Forest login risk model.")
+    parser.add_argument("--input", default="useractivityvariation5.csv", help="Training CSV")
+    parser.add_argument("--geo-mode", choices=GEO_VELOCITY_MODES, default="exact",
+                        help="exact: geopy geodesic per row; fast: vectorized Lambert approximation")
+    parser.add_argument("--output-dir", default=".", help="Directory for the trained artifacts")
+    parser.add_argument("--bundle", default="model_bundle.ifb", help="Model bundle path (relative to --output-dir), empty to skip")
+    parser.add_argument("--time-format", default=LOGIN_TIME_FORMAT, help="strptime format of LoginTime")
+    parser.add_argument("--feature-cache", default=FEATURE_CACHE_DIR,
+                        help=f"Directory caching engineered features between runs (default {FEATURE_CACHE_DIR})")
+    parser.add_argument("--no-feature-cache", dest="feature_cache", action="store_const", const="",
+                        help="Always rebuild the features and leave the cache alone")
+    parser.add_argument("--stream", action="store_true",
+                        help="Stream the input in chunks for datasets larger than RAM")
+    parser.add_argument("--chunksize", type=int, default=100000, help="Rows per chunk in --stream mode")
+    parser.add_argument("--reservoir-size", type=int, default=200000,
+                        help="Rows sampled for fitting the forest in --stream mode")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--ip-frequencies", choices=("sketch", "exact"), default="sketch",
+                        help="sketch: fixed-memory counts per IP, /24 and /16 with decay; exact: per-IP table")
+    parser.add_argument("--ip-sketch-width", type=int, default=1 << 15, help="Counters per sketch row (a power of two)")
+    parser.add_argument("--ip-sketch-depth", type=int, default=4, help="Hashed rows per sketch")
+    parser.add_argument("--ip-half-life-days", type=float, default=30.0, help="Half-life of the IP counts, 0 for no decay")
+    parser.add_argument("--validation-fraction", type=float, default=0.0,
+                        help="Rows held out from fitting to calibrate the decision thresholds (default 0: fit on all rows and calibrate on them)")
+    parser.add_argument("--allow-percentile", type=float, default=ALLOW_PERCENTILE,
+                        help="Percentile of validation risk scores below which logins are allowed")
+    parser.add_argument("--mfa-percentile", type=float, default=MFA_PERCENTILE,
+                        help="Percentile of validation risk scores up to which logins get MFA")
+    parser.add_argument("--compare-geo", action="store_true",
+                        help="Report the maximum error of the fast geo-velocity path against geopy")
+    return parser.parse_args(argv)
+
+# Compute geo-velocity from the shifted previous-login columns
+def compute_geo_velocity(df, mode="exact"):
+    time_diff = (df["LoginTime"] - df["prev_login_time"]).dt.total_seconds().to_numpy() / 3600.0
+    return geo_velocity(
+        df["prev_latitude"].to_numpy(), df["prev_longitude"].to_numpy(),
+        df["Latitude"].to_numpy(), df["Longitude"].to_numpy(),
+        time_diff, mode=mode
+    )
+
+def report_geo_error(df):
+    args = (df["prev_latitude"].to_numpy(), df["prev_longitude"].to_numpy(), df["Latitude"].to_numpy(), df["Longitude"].to_numpy())
+    exact, fast = geodesic_km(*args), lambert_km(*args)
+    distance_error = np.nanmax(np.abs(fast - exact))
+    speed_error = np.max(np.abs(compute_geo_velocity(df, "fast") - compute_geo_velocity(df, "exact")))
+    print(f"ℹ️ Fast geo path vs geopy: max distance error {distance_error:.4f} km, max velocity error {speed_error:.4f} km/h")
+
+def build_features(df, geo_mode="exact", compare_geo=False, time_format=LOGIN_TIME_FORMAT, ip_sketch=None):
+    """Engineer the model features from the raw login CSV rows. Returns the
+    feature frame (indexed by original row number), the IP frequencies (an
+    IPFrequencySketch built with the `ip_sketch` arguments, or the exact
+    table when None) and the fitted label encoders."""
+    # Convert `LoginTime` to datetime with an explicit format (no per-run format inference)
+    df["LoginTime"] = pd.to_datetime(df["LoginTime"], format=time_format, errors="coerce")
+
+    # Compute frequency of each IP address & add as feature (keyed by IP string, as served)
+    if ip_sketch is None:
+        ip_frequencies = df["IPaddress"].value_counts(normalize=True).to_dict()
+        df["ip_frequency"] = df["IPaddress"].map(ip_frequencies)
+    else:
+        ip_frequencies = IPFrequencySketch(**ip_sketch)
+        timed = df[df["LoginTime"].notna()]
+        ip_frequencies.update_many(timed["IPaddress"].astype(str).to_numpy(),
+                                   (timed["LoginTime"] - pd.Timestamp(0)).dt.total_seconds().to_numpy())
+        df["ip_frequency"] = ip_frequencies.get_many(df["IPaddress"].astype(str).to_numpy())
+
+    # Encode categorical features
+    label_encoders = {}
+    categorical_cols = ["IPaddress", "Timezone", "DeviceInfo"]
+    for col in categorical_cols:
+        lookup = CategoryLookup.fit(df[col])
+        df[col] = lookup.encode_many(df[col])
+        label_encoders[col] = lookup.to_label_encoder()
+
+    # Sort by userID and LoginTime for sequential processing
+    df = df.sort_values(by=["userID", "LoginTime"])
+    df["prev_latitude"] = df.groupby("userID")["Latitude"].shift(1)
+    df["prev_longitude"] = df.groupby("userID")["Longitude"].shift(1)
+    df["prev_login_time"] = df.groupby("userID")["LoginTime"].shift(1)
+
+    # Rolling-history features, from the same LoginHistory serving uses
+    df[HISTORY_COLUMNS] = history_features(df["userID"].to_numpy(), (df["LoginTime"] - pd.Timestamp(0)).dt.total_seconds().to_numpy(),
+                                           df["DeviceInfo"].to_numpy(), df["Timezone"].to_numpy(), HISTORY_SIZE)
+
+    # Drop NaN values (ensures every entry has a valid previous login)
+    df.dropna(inplace=True)
+    if df.empty:
+        raise ValueError("Error: The dataset is empty after preprocessing! Check data loading.")
+
+    df["geo_velocity"] = compute_geo_velocity(df, geo_mode)
+    print(f"✅ Geo-velocity computed ({geo_mode}).")
+    if compare_geo:
+        report_geo_error(df)
+
+    # Extract login hour
+    df["login_hour"] = df["LoginTime"].dt.hour
+
+    return df, ip_frequencies, label_encoders
+
+def main(argv=None):
+    args = parse_args(argv)
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    def output_path(name):
+        return os.path.join(args.output_dir, name)
+
+    if args.stream:
+        return train_streaming(args, output_path)
+
+    # --compare-geo needs the intermediate columns, so it always rebuilds
+    if args.feature_cache and not args.compare_geo:
+        table, hit = load_features(args.input, args.geo_mode, args.time_format, args.feature_cache, ip_sketch_params(args))
+        print(f"✅ Features {'loaded from' if hit else 'built and saved to'} cache {table.key}. Rows: {len(table.features)}")
+        features, ip_frequencies, label_encoders = table.features, table.ip_frequencies, table.label_encoders
+    else:
+        # Load dataset
+        df = pd.read_csv(args.input)
+        print(f"✅ Dataset loaded. Shape: {df.shape}")
+        df, ip_frequencies, label_encoders = build_features(df, args.geo_mode, args.compare_geo, args.time_format, ip_sketch_params(args))
+        features = df[FEATURE_COLUMNS].to_numpy()
+
+    joblib.dump(ip_frequencies, output_path("ip_frequencies.pkl"))
+    joblib.dump(label_encoders, output_path("label_encoders.pkl"))
+    print("✅ Label encoders saved.")
+
+    # Normalize numerical features
+    scaler = MinMaxScaler()
+    X = scaler.fit_transform(features)
+    joblib.dump(scaler, output_path("scaler.pkl"))
+    print("✅ Numerical features normalized and scaler saved.")
+
+    # Prepare training data
+    if X.shape[0] == 0:
+        raise ValueError("Error: No training data available after preprocessing!")
+
+    # Train Isolation Forest model and calibrate its decision thresholds
+    iso_forest, calibration = fit_and_calibrate(X, args)
+    calibration.save(output_path("calibration.json"))
+
+    # Save the model
+    joblib.dump(iso_forest, output_path("isolation_forest_model.pkl"))
+    print("✅ Isolation Forest training complete. Model saved successfully!")
+
+    if args.bundle:
+        write_bundle(output_path(args.bundle), iso_forest, scaler, label_encoders, ip_frequencies, meta={
+            "trained_at": datetime.utcnow().isoformat(),
+            "input": args.input,
+            "geo_mode": args.geo_mode
+        }, calibration=calibration)
+        print(f"✅ Model bundle written to {output_path(args.bundle)}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""Previous-login lookup latency as login_attempts grows, with and without the
+(userID, LoginTime) index.
+
+Defaults to a throwaway SQLite file; pass --database-url for a MySQL stand-in
+(the table is dropped and recreated). Run from the repository root:
+    python benchmarks/bench_db_lookup.py --sizes 10000,100000,1000000
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+from sqlalchemy import Column, DateTime, Float, Index, Integer, MetaData, String, Table, create_engine, insert, select
+
+# Same shape as app.LoginAttempt
+metadata = MetaData()
+login_attempts = Table(
+    "login_attempts", metadata,
+    Column("id", Integer, primary_key=True, autoincrement=True),
+    Column("userID", String(255), nullable=False),
+    Column("IPaddress", String(50), nullable=False),
+    Column("Latitude", Float, nullable=False, default=0.0),
+    Column("Longitude", Float, nullable=False, default=0.0),
+    Column("Timezone", String(50)),
+    Column("DeviceInfo", String(255), default='Unknown'),
+    Column("TypingSpeed", Float, default=0.0),
+    Column("MouseSpeed", Float, default=0.0),
+    Column("geo_velocity", Float, default=0.0),
+    Column("LoginTime", DateTime)
+)
+user_time_index = Index("ix_login_attempts_user_time", login_attempts.c.userID, login_attempts.c.LoginTime)
+
+# The query app.get_prev_attempt issues on a cache miss: the previous login
+# and, for a user without loaded history, the rest of its HISTORY_SIZE logins
+def latest_logins(userID, limit=10):
+    return (select(login_attempts).where(login_attempts.c.userID == userID)
+            .order_by(login_attempts.c.LoginTime.desc()).limit(limit))
+
+def grow(engine, start, stop, users, rng, chunk=50000):
+    base = datetime(2024, 1, 1)
+    for lo in range(start, stop, chunk):
+        n = min(chunk, stop - lo)
+        user_ids = rng.integers(0, users, n)
+        seconds = rng.integers(0, 365 * 86400, n)
+        rows = [{
+            "userID": f"user{u}", "IPaddress": f"10.0.{u % 256}.{u % 200}", "Latitude": 0.0, "Longitude": 0.0,
+            "Timezone": "UTC", "DeviceInfo": "Desktop", "TypingSpeed": 1.0, "MouseSpeed": 1.0, "geo_velocity": 0.0,
+            "LoginTime": base + timedelta(seconds=int(s))
+        } for u, s in zip(user_ids, seconds)]
+        with engine.begin() as conn:
+            conn.execute(insert(login_attempts), rows)
+
+def time_lookups(engine, users, lookups, rng):
+    samples = []
+    with engine.connect() as conn:
+        for u in rng.integers(0, users, lookups):
+            start = time.perf_counter()
+            conn.execute(latest_logins(f"user{u}")).all()
+            samples.append(time.perf_counter() - start)
+    samples = np.asarray(samples) * 1e3
+    return {f"p{q}_ms": float(np.percentile(samples, q)) for q in (50, 99)}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url", help="Default: a temporary SQLite file")
+    parser.add_argument("--sizes", default="10000,100000,1000000", help="Comma-separated table sizes")
+    parser.add_argument("--users", type=int, default=100000)
+    parser.add_argument("--lookups", type=int, default=2000, help="Lookups timed per size with the index")
+    parser.add_argument("--scan-lookups", type=int, default=50, help="Lookups timed per size without it")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", help="Write the results to this file")
+    args = parser.parse_args()
+
+    url = args.database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'lookup.sqlite')}"
+    engine = create_engine(url)
+    metadata.drop_all(engine)
+    metadata.create_all(engine)
+    user_time_index.drop(engine)
+    rng = np.random.default_rng(args.seed)
+
+    results = []
+    rows = 0
+    print(f"{'rows':>10} {'index':<6} {'p50 ms':>8} {'p99 ms':>8}")
+    for size in (int(s) for s in args.sizes.split(",")):
+        grow(engine, rows, size, args.users, rng)
+        rows = size
+        for indexed, lookups in ((False, args.scan_lookups), (True, args.lookups)):
+            if indexed:
+                user_time_index.create(engine)
+            result = dict(time_lookups(engine, args.users, lookups, rng), rows=rows, indexed=indexed)
+            results.append(result)
+            print(f"{rows:>10} {'yes' if indexed else 'no':<6} {result['p50_ms']:>8.3f} {result['p99_ms']:>8.3f}")
+        # Inserts go faster without the index; it is rebuilt at the next size
+        user_time_index.drop(engine)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""Encoding cost on the serving path: the old per-request LabelEncoder and
+pickled-dict lookups against what scoring.py does now.
+
+  startup        compile_encoders / compile_ip_frequencies, once per model load
+  per request    ip_frequency on the loaded model's table, as scoring.feature_matrix
+  per batch      ip_frequency_many over a batch of IPs, as bulk scoring
+
+Timezone and DeviceInfo are not model features, so serving no longer
+encodes them at all; the old path is timed with them for comparison.
+
+Run from the repository root: python benchmarks/bench_encoding.py
+"""
+import os
+import sys
+import timeit
+import warnings
+
+import joblib
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from encoding import compile_encoders, compile_ip_frequencies, ip_frequency, ip_frequency_many
+from model_bundle import load_bundle
+
+warnings.filterwarnings("ignore")
+label_encoders = joblib.load("label_encoders.pkl")
+ip_frequencies = joblib.load("ip_frequencies.pkl")
+model = load_bundle(os.environ.get("MODEL_BUNDLE_PATH", "model_bundle.ifb"))
+
+REQUEST = {"IPaddress": "156.200.77.99", "Timezone": "Europe/London", "DeviceInfo": "Windows"}
+BATCH_SIZE = 64
+
+def legacy_encode(data):
+    ip_freq = ip_frequencies.get(data["IPaddress"], 0.0001)
+    Timezone = data["Timezone"]
+    if "Timezone" in label_encoders and Timezone in label_encoders["Timezone"].classes_:
+        Timezone = label_encoders["Timezone"].transform([Timezone])[0]
+    DeviceInfo = data["DeviceInfo"]
+    if "DeviceInfo" in label_encoders and DeviceInfo in label_encoders["DeviceInfo"].classes_:
+        DeviceInfo = label_encoders["DeviceInfo"].transform([DeviceInfo])[0]
+    return ip_freq, Timezone, DeviceInfo
+
+def compile_tables():
+    return compile_encoders(label_encoders), compile_ip_frequencies(ip_frequencies, label_encoders)
+
+def best_time(fn, number):
+    return min(timeit.repeat(fn, number=number, repeat=5)) / number
+
+if __name__ == "__main__":
+    _, ip_table = compile_tables()
+    ips = np.array((list(ip_table) * BATCH_SIZE)[:BATCH_SIZE // 2] + [f"10.0.0.{i}" for i in range(BATCH_SIZE // 2)], dtype=str)
+    print(f"bundle IP table: {type(model.ip_frequency_table).__name__}, {len(ip_table)} IPs in the pickle")
+
+    print(f"{'compile_encoders + compile_ip_frequencies':<44} {best_time(compile_tables, 20) * 1e3:10.3f} ms/load")
+    print(f"{'LabelEncoder path':<44} {best_time(lambda: legacy_encode(REQUEST), 2000) * 1e6:10.3f} us/request")
+    print(f"{'ip_frequency, bundle table':<44} "
+          f"{best_time(lambda: ip_frequency(model.ip_frequency_table, REQUEST['IPaddress']), 20000) * 1e6:10.3f} us/request")
+    print(f"{'ip_frequency, compiled dict':<44} "
+          f"{best_time(lambda: ip_frequency(ip_table, REQUEST['IPaddress']), 200000) * 1e6:10.3f} us/request")
+    per_login = best_time(lambda: ip_frequency_many(model.ip_frequency_table, ips), 2000) / BATCH_SIZE
+    print(f"{f'ip_frequency_many, bundle table, {BATCH_SIZE} IPs':<44} {per_login * 1e6:10.3f} us/login")
@@ -0,0 +1,89 @@
+"""Scoring throughput with concurrent callers: one score_round call per
+request vs the MicroBatcher coalescing them.
+
+No DB or HTTP is involved; this isolates the model stage that /predict
+runs per request.
+
+Run from the repository root: python benchmarks/bench_micro_batch.py --threads 1,8,32
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+import warnings
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from loadgen import login_events
+from micro_batcher import MicroBatcher
+from model_bundle import load_bundle
+from scoring import parse_login, score_round
+
+warnings.filterwarnings("ignore")
+
+def run(score_one, logins, threads):
+    latencies = [[] for _ in range(threads)]
+
+    def worker(k):
+        for login in logins[k::threads]:
+            start = time.perf_counter()
+            score_one(login)
+            latencies[k].append(time.perf_counter() - start)
+
+    pool = [threading.Thread(target=worker, args=(k,)) for k in range(threads)]
+    start = time.perf_counter()
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    samples = np.concatenate([np.asarray(l) for l in latencies]) * 1e3
+    return {"throughput_per_s": len(samples) / elapsed, **{f"p{q}_ms": float(np.percentile(samples, q)) for q in (50, 99)}}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--bundle", default=os.path.join(ROOT, "model_bundle.ifb"))
+    parser.add_argument("--threads", default="1,8,32")
+    parser.add_argument("--users", type=int, default=300)
+    parser.add_argument("--max-batch-size", type=int, default=64)
+    parser.add_argument("--max-wait", type=float, default=0.002)
+    parser.add_argument("--geo-mode", choices=("exact", "fast"), default="fast")
+    parser.add_argument("--json", help="Write the results to this file")
+    args = parser.parse_args()
+
+    model = load_bundle(args.bundle)
+    logins = [parse_login(event) for event in login_events(args.users)]
+
+    def direct(login):
+        return score_round([login], [None], model, args.geo_mode)[0]
+
+    def score_batch(items):
+        return score_round([login for login, _ in items], [prev for _, prev in items], model, args.geo_mode)
+
+    results = []
+    print(f"{'threads':>7} {'mode':<8} {'req/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'mean batch':>11} {'p99 wait ms':>12}")
+    for threads in (int(t) for t in args.threads.split(",")):
+        result = dict(run(direct, logins, threads), threads=threads, mode="direct")
+        results.append(result)
+        print(f"{threads:>7} {'direct':<8} {result['throughput_per_s']:>9.1f} {result['p50_ms']:>8.2f} {result['p99_ms']:>8.2f}")
+
+        batcher = MicroBatcher(score_batch, args.max_batch_size, args.max_wait).start()
+        result = dict(run(lambda login: batcher.score((login, None)), logins, threads), threads=threads, mode="batched")
+        batcher.stop()
+        stats = batcher.stats()
+        result.update(mean_batch_size=stats["mean_batch_size"], p99_queue_delay_ms=stats["queue_delay_quantiles"][0.99] * 1e3)
+        results.append(result)
+        print(f"{threads:>7} {'batched':<8} {result['throughput_per_s']:>9.1f} {result['p50_ms']:>8.2f} {result['p99_ms']:>8.2f} "
+              f"{result['mean_batch_size']:>11.1f} {result['p99_queue_delay_ms']:>12.2f}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""Cold-start time and per-worker memory: four joblib pickles vs the mmapped bundle.
+
+Starts N fresh worker processes per mode. Each one imports the loader, loads
+the artifacts and scores one row, then all workers report their memory while
+still alive so shared bundle pages show up in the proportional (Pss) numbers.
+
+Run from the repository root: python benchmarks/bench_model_load.py --workers 4
+"""
+import argparse
+import multiprocessing as mp
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def memory_kb():
+    stats = {}
+    with open("/proc/self/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if parts[0] in ("Rss:", "Pss:", "Private_Clean:", "Private_Dirty:"):
+                stats[parts[0][:-1]] = int(parts[1])
+    stats["Private"] = stats.pop("Private_Clean") + stats.pop("Private_Dirty")
+    return stats
+
+def worker(mode, barrier, results):
+    import warnings
+    warnings.filterwarnings("ignore")
+    sys.path.insert(0, ROOT)
+    os.chdir(ROOT)
+    import numpy as np
+    baseline = memory_kb()
+
+    start = time.perf_counter()
+    import model_bundle
+    if mode == "bundle":
+        model = model_bundle.load_bundle("model_bundle.ifb")
+    else:
+        model = model_bundle.load_pickles()
+    model.risk_scores(np.zeros((1, len(model_bundle.FEATURE_COLUMNS))))
+    elapsed = time.perf_counter() - start
+
+    barrier.wait()
+    after = memory_kb()
+    results.put((elapsed, {key: after[key] - baseline[key] for key in after}))
+    barrier.wait()
+
+def run(mode, workers):
+    ctx = mp.get_context("spawn")
+    barrier = ctx.Barrier(workers)
+    results = ctx.Queue()
+    procs = [ctx.Process(target=worker, args=(mode, barrier, results)) for _ in range(workers)]
+    for p in procs:
+        p.start()
+    samples = [results.get() for _ in procs]
+    for p in procs:
+        p.join()
+
+    def mean(values):
+        return sum(values) / len(values)
+    load = mean([elapsed for elapsed, _ in samples])
+    memory = {key: mean([m[key] for _, m in samples]) / 1024 for key in samples[0][1]}
+    print(f"{mode:<8} load+first score {load * 1e3:8.1f} ms   "
+          f"RSS +{memory['Rss']:6.1f} MiB   PSS +{memory['Pss']:6.1f} MiB   private +{memory['Private']:6.1f} MiB")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+    print(f"{args.workers} workers per mode, memory relative to the process after importing numpy")
+    for mode in ("pickles", "bundle"):
+        run(mode, args.workers)
@@ -0,0 +1,164 @@
+"""Throughput and memory of serve.py workers against independent processes.
+
+For each worker count N, runs the service twice on a throwaway SQLite
+database:
+  prefork      serve.py --workers N: the model is loaded once and shared
+  independent  N separate serve.py --workers 1 servers, each loading its own
+Client processes then post /predict for a fixed time over keep-alive
+connections, and the memory of every serving process is read from
+/proc/<pid>/smaps_rollup after the load, so copy-on-write faults show up.
+The total Pss is what the N workers really cost the machine.
+
+Throughput only scales with N up to the cores the server and clients share;
+pass --pin to pin serve.py's workers.
+
+The two modes are not equivalent. prefork with N > 1 runs app.py with
+WORKER_PROCESSES=N: no last-login cache, no write-behind and a history
+reload per request, so every worker sees every login. The independent
+servers each keep their caches as if they were alone. They are only correct
+when each user's logins always reach the same server, so their throughput
+is an upper bound, not a deployable alternative.
+
+Run from the repository root: python benchmarks/bench_serve.py --workers 1,2,4
+"""
+import argparse
+import http.client
+import json
+import multiprocessing as mp
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from loadgen import login_events
+
+def memory_kb(pid):
+    stats = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if parts[0] in ("Rss:", "Pss:", "Private_Clean:", "Private_Dirty:"):
+                stats[parts[0][:-1]] = int(parts[1])
+    stats["Private"] = stats.pop("Private_Clean") + stats.pop("Private_Dirty")
+    return stats
+
+def children(pid):
+    result = []
+    for entry in os.listdir("/proc"):
+        if entry.isdigit():
+            try:
+                with open(f"/proc/{entry}/stat") as f:
+                    # The ppid follows the parenthesised command name
+                    if int(f.read().rsplit(")", 1)[1].split()[1]) == pid:
+                        result.append(int(entry))
+            except (OSError, IndexError, ValueError):
+                continue
+    return result
+
+def wait_ready(port, timeout=120.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=1.0)
+            conn.request("GET", "/cache_stats")
+            if conn.getresponse().status == 200:
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"Error: Server on port {port} did not start!")
+
+def start_servers(ports, workers, pin, env):
+    servers = []
+    for port in ports:
+        command = [sys.executable, "serve.py", "--port", str(port), "--workers", str(workers)] + (["--pin"] if pin else [])
+        servers.append(subprocess.Popen(command, cwd=ROOT, env=env, stdout=subprocess.DEVNULL))
+    for port in ports:
+        wait_ready(port)
+    # Each server's workers start serving a moment after the first one answers
+    for server in servers:
+        while len(children(server.pid)) < workers:
+            time.sleep(0.1)
+    return servers
+
+def client(port, events, duration, results):
+    conn = http.client.HTTPConnection("127.0.0.1", port)
+    headers = {"Content-Type": "application/json"}
+    bodies = [json.dumps({k: v for k, v in event.items() if k != "anomalous"}) for event in events]
+    done = errors = 0
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        conn.request("POST", "/predict", bodies[done % len(bodies)], headers)
+        response = conn.getresponse()
+        response.read()
+        done += 1
+        errors += response.status != 200
+    conn.close()
+    results.put((done, errors))
+
+def drive(ports, clients, events, duration):
+    ctx = mp.get_context("fork")
+    results = ctx.Queue()
+    # Each client gets its own users, so history lookups do not collide
+    procs = [ctx.Process(target=client, args=(ports[i % len(ports)], events[i::clients], duration, results))
+             for i in range(clients)]
+    start = time.perf_counter()
+    for p in procs:
+        p.start()
+    samples = [results.get() for _ in procs]
+    elapsed = time.perf_counter() - start
+    for p in procs:
+        p.join()
+    return sum(done for done, _ in samples) / elapsed, sum(errors for _, errors in samples)
+
+def run(mode, workers, args, events, env):
+    if mode == "prefork":
+        ports = [args.port]
+        servers = start_servers(ports, workers, args.pin, env)
+    else:
+        ports = [args.port + i for i in range(workers)]
+        servers = start_servers(ports, 1, False, env)
+    try:
+        throughput, errors = drive(ports, args.clients or 2 * workers, events, args.duration)
+        serving = [pid for server in servers for pid in children(server.pid)]
+        memory = [memory_kb(pid) for pid in serving]
+        total_pss = sum(m["Pss"] for m in memory) + sum(memory_kb(server.pid)["Pss"] for server in servers)
+    finally:
+        for server in servers:
+            server.terminate()
+        for server in servers:
+            server.wait()
+
+    def mean(key):
+        return sum(m[key] for m in memory) / len(memory) / 1024
+    print(f"{workers:>3} {mode:<12} {throughput:9.1f} req/s  {errors:4d} errors   per worker: "
+          f"RSS {mean('Rss'):6.1f}  PSS {mean('Pss'):6.1f}  private {mean('Private'):6.1f} MiB   "
+          f"total PSS {total_pss / 1024:7.1f} MiB")
+    return throughput
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", default="1,2,4", help="Comma-separated worker counts")
+    parser.add_argument("--clients", type=int, default=0, help="Client processes (default: twice the workers)")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds of load per run")
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--port", type=int, default=5100)
+    parser.add_argument("--pin", action="store_true", help="Pin serve.py's workers to cores")
+    args = parser.parse_args()
+
+    events = login_events(args.users)
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{tempfile.mkdtemp(prefix='bench-')}/login_attempts.db",
+               USER_PROFILES_PATH="")
+    print(f"{len(os.sched_getaffinity(0))} cores available, {args.duration:.0f} s per run; memory is MiB after the load")
+    baseline = None
+    for workers in (int(n) for n in args.workers.split(",")):
+        for mode in ("prefork", "independent"):
+            throughput = run(mode, workers, args, events, env)
+            if mode == "prefork":
+                baseline = baseline or throughput / workers
+                print(f"{'':>16} {throughput / (baseline * workers):6.0%} of linear scaling")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""Drive /predict or /predict_batch with synthetic login streams and report
+throughput, latency percentiles and per-stage timings.
+
+By default the app runs in-process through the Flask test client with a
+throwaway SQLite database standing in for MySQL. Pass --url to drive a
+running server instead.
+
+Run from the repository root: python benchmarks/bench_service.py --users 500
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import urllib.request
+from collections import Counter
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from loadgen import login_events
+
+def percentiles(samples):
+    samples = np.asarray(samples)
+    return {f"p{q}": float(np.percentile(samples, q)) * 1e3 for q in (50, 95, 99)} | {"max": float(samples.max()) * 1e3}
+
+def make_client(url):
+    if url:
+        def post(path, payload):
+            req = urllib.request.Request(url + path, data=json.dumps(payload).encode(), headers={"Content-Type": "application/json"})
+            with urllib.request.urlopen(req) as response:
+                return json.loads(response.read())
+
+        def get_text(path):
+            with urllib.request.urlopen(url + path) as response:
+                return response.read().decode()
+        return post, get_text, None
+
+    os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp(prefix='bench-')}/login_attempts.db")
+    os.chdir(ROOT)
+    import app as service
+    with service.app.app_context():
+        service.db.create_all()
+    client = service.app.test_client()
+    return (lambda path, payload: client.post(path, json=payload).get_json(),
+            lambda path: client.get(path).get_data(as_text=True),
+            service)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--mode", choices=("predict", "batch"), default="predict")
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--url", help="Base URL of a running service, e.g. http://127.0.0.1:5000")
+    parser.add_argument("--json", help="Write the results to this file")
+    args = parser.parse_args()
+
+    events = login_events(args.users, args.seed)
+    post, get_text, service = make_client(args.url)
+
+    latencies = []
+    decisions = Counter()
+    start = time.perf_counter()
+    if args.mode == "predict":
+        for event in events:
+            t = time.perf_counter()
+            result = post("/predict", {k: v for k, v in event.items() if k != "anomalous"})
+            latencies.append(time.perf_counter() - t)
+            decisions[(event["anomalous"], result.get("risk_decision", "error"))] += 1
+    else:
+        for i in range(0, len(events), args.batch_size):
+            chunk = events[i:i + args.batch_size]
+            t = time.perf_counter()
+            results = post("/predict_batch", {"events": [{k: v for k, v in e.items() if k != "anomalous"} for e in chunk]})["results"]
+            latencies.append(time.perf_counter() - t)
+            for event, result in zip(chunk, results):
+                decisions[(event["anomalous"], result.get("risk_decision", "error"))] += 1
+    elapsed = time.perf_counter() - start
+
+    report = {
+        "mode": args.mode,
+        "events": len(events),
+        "throughput_per_s": len(events) / elapsed,
+        "request_latency_ms": percentiles(latencies),
+        "decisions": {f"{'anomalous' if anomalous else 'normal'}:{decision}": count for (anomalous, decision), count in sorted(decisions.items())}
+    }
+    if service is not None:
+        report["stage_latency_ms"] = {stage: {f"p{int(q * 100)}": value * 1e3 for q, value in quantiles.items()}
+                                      for stage, quantiles in service.stage_metrics.summary().items()}
+    else:
+        report["metrics"] = [line for line in get_text("/metrics").splitlines() if "recent_duration_seconds{" in line]
+
+    print(f"{report['events']} events via {args.mode}: {report['throughput_per_s']:.1f} events/s")
+    print("request latency (ms): " + "  ".join(f"{k} {v:.2f}" for k, v in report["request_latency_ms"].items()))
+    for stage, values in report.get("stage_latency_ms", {}).items():
+        print(f"  {stage:<28} " + "  ".join(f"{k} {v:.3f}" for k, v in values.items()))
+    for line in report.get("metrics", []):
+        print("  " + line)
+    print("decisions: " + ", ".join(f"{k}={v}" for k, v in report["decisions"].items()))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""Offline IF.py benchmark: training wall time and peak memory at several
+dataset sizes, on CSVs generated with the DataGenScripts chain.
+
+Run from the repository root: python benchmarks/bench_training.py --sizes 10000,100000,1000000
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from loadgen import write_csv
+
+def run_training(csv_path, output_dir, extra_args):
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, os.path.join(ROOT, "IF.py"), "--input", csv_path, "--output-dir", output_dir] + extra_args,
+        stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, cwd=ROOT
+    )
+    # wait4 gives this child's own rusage, so peak RSS is not shared across runs
+    _, status, usage = os.wait4(proc.pid, 0)
+    elapsed = time.perf_counter() - start
+    if status != 0:
+        raise RuntimeError(f"IF.py failed on {csv_path}: {proc.stderr.read().decode()[-2000:]}")
+    return elapsed, usage.ru_maxrss / 1024
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="10000,100000,1000000", help="Comma-separated row counts")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--geo-mode", choices=("exact", "fast"), default="fast")
+    parser.add_argument("--workdir", help="Keep generated CSVs and artifacts here")
+    parser.add_argument("--json", help="Write the results to this file")
+    args, extra = parser.parse_known_args()
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="bench-training-")
+    results = []
+    print(f"{'rows':>10} {'generate s':>11} {'train s':>9} {'peak RSS MiB':>13}")
+    for size in [int(s) for s in args.sizes.split(",")]:
+        csv_path = os.path.join(workdir, f"logins_{size}.csv")
+        start = time.perf_counter()
+        rows = write_csv(csv_path, size, args.seed)
+        generate_seconds = time.perf_counter() - start
+
+        # No feature cache: loadgen CSVs repeat byte for byte, so a cache would skip feature engineering
+        train_seconds, peak_rss = run_training(csv_path, os.path.join(workdir, f"model_{size}"),
+                                               ["--geo-mode", args.geo_mode, "--no-feature-cache"] + extra)
+        results.append({"rows": rows, "generate_seconds": generate_seconds, "train_seconds": train_seconds, "peak_rss_mib": peak_rss})
+        print(f"{rows:>10} {generate_seconds:>11.2f} {train_seconds:>9.2f} {peak_rss:>13.1f}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"geo_mode": args.geo_mode, "results": results}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""Synthetic login streams built from the DataGenScripts generators.
+
+Each synthetic user starts from a row of CSV/useractivity.csv and goes
+through the same chain that produced useractivityvariation5.csv: variation,
+variation2, variation3, variation4 and finally variationanomalous, which adds
+one anomalous login per user.
+"""
+import csv
+import os
+import random
+import sys
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "DataGenScripts"))
+
+import variation
+import variation2
+import variation3
+import variation4
+import variationanomalous
+
+FIELDNAMES = ["userID", "IPaddress", "Timezone", "Latitude", "Longitude", "DeviceInfo", "TypingSpeed", "MouseSpeed", "LoginTime"]
+BASE_CSV = os.path.join(ROOT, "CSV", "useractivity.csv")
+TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+def load_base_rows(path=BASE_CSV):
+    with open(path, mode='r', encoding='utf-8') as infile:
+        return list(csv.DictReader(infile))
+
+def normalize(row):
+    return {field: str(row[field]) for field in FIELDNAMES}
+
+def user_history(base_row):
+    """Six normal logins in file order plus one anomalous login."""
+    rows = [base_row, variation.introducevariation(base_row)]
+    rows = [rows[0], variation2.majorvariation(rows[0]), rows[1], variation2.majorvariation(rows[1])]
+    rows = [normalize(row) for row in rows]
+    rows.append(normalize(variation3.generate_variation(rows[3])))
+    rows.append(normalize(variation4.generate_variation(rows[4])))
+    anomalous = normalize(variationanomalous.generate_entry(rows[-1]))
+    rows = sorted(rows, key=lambda row: datetime.strptime(row['LoginTime'], TIME_FORMAT))[-6:]
+    return rows, anomalous
+
+def generate_users(n_users, seed=42, base_rows=None):
+    """Yield (normal_rows, anomalous_row) for n_users synthetic users."""
+    random.seed(seed)
+    base_rows = base_rows or load_base_rows()
+    for k in range(n_users):
+        base = dict(base_rows[k % len(base_rows)])
+        base["userID"] = f"{base['userID']}-{k // len(base_rows)}" if k >= len(base_rows) else base["userID"]
+        yield user_history(base)
+
+def write_csv(path, n_rows, seed=42):
+    """Write a training CSV shaped like useractivityvariation5.csv (normal
+    logins first, then one anomalous login per user) with about n_rows rows."""
+    n_users = max(1, n_rows // 7)
+    anomalies = []
+    with open(path, mode='w', newline='', encoding='utf-8') as outfile:
+        writer = csv.DictWriter(outfile, fieldnames=FIELDNAMES)
+        writer.writeheader()
+        for rows, anomalous in generate_users(n_users, seed):
+            writer.writerows(rows)
+            anomalies.append(anomalous)
+        writer.writerows(anomalies)
+    return n_users * 7
+
+def to_event(row, anomalous=False):
+    return {
+        "userID": row["userID"],
+        "IPaddress": row["IPaddress"],
+        "Latitude": float(row["Latitude"]),
+        "Longitude": float(row["Longitude"]),
+        "Timezone": row["Timezone"],
+        "DeviceInfo": row["DeviceInfo"],
+        "TypingSpeed": float(row["TypingSpeed"]),
+        "MouseSpeed": float(row["MouseSpeed"]),
+        "anomalous": anomalous
+    }
+
+def login_events(n_users, seed=42, anomalous=True):
+    """Interleaved /predict payloads: every user's normal history in time
+    order, round-robin across users, followed by the anomalous logins."""
+    histories = list(generate_users(n_users, seed))
+    events = []
+    for step in range(max(len(rows) for rows, _ in histories)):
+        for rows, _ in histories:
+            if step < len(rows):
+                events.append(to_event(rows[step]))
+    if anomalous:
+        events.extend(to_event(row, anomalous=True) for _, row in histories)
+    return events
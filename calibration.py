@@ -0,0 +1,171 @@
+"""Decision thresholds calibrated on a model's own risk-score distribution.
+
+The forest's risk scores shift with every retrain, so fixed cut-offs drift.
+Training records quantiles of the risk scores on its training and
+validation rows. The Allow / MFA thresholds sit at fixed percentiles of the
+validation scores. Without a validation fraction the forest is fitted on
+all rows, and the same rows calibrate it.
+
+ALLOW_PERCENTILE and MFA_PERCENTILE are where the original -0.11 / -0.05
+cut-offs fell for the original model. A recalibrated model therefore splits
+traffic the same way.
+
+At serve time a sorted threshold array maps scores to decisions, and the
+quantiles give each score's percentile rank, both with one vectorized
+search per batch.
+
+Calibrate an existing bundle against its training CSV:
+    python calibration.py --bundle model_bundle.ifb --input useractivityvariation5.csv
+"""
+import argparse
+import json
+import os
+import numpy as np
+
+# Percentiles of validation risk scores below which a login is allowed, and
+# up to which it gets MFA (the rest are blocked)
+ALLOW_PERCENTILE = 8.3
+MFA_PERCENTILE = 60.7
+# Fixed thresholds of the original model, for bundles without a calibration
+DEFAULT_ALLOW_THRESHOLD = -0.11
+DEFAULT_MFA_THRESHOLD = -0.05
+# Resolution of the stored quantiles (0.1 percentile)
+QUANTILE_POINTS = 1001
+
+MODEL_DECISIONS = np.array(["Allow", "MFA", "Block"])
+
+class Calibration:
+    """Allow / MFA thresholds for raw risk scores, plus the validation (and
+    training) quantiles used for percentile ranks, if known."""
+
+    def __init__(self, allow_threshold=DEFAULT_ALLOW_THRESHOLD, mfa_threshold=DEFAULT_MFA_THRESHOLD,
+                 validation_quantiles=None, train_quantiles=None, meta=None):
+        self.allow_threshold = float(allow_threshold)
+        self.mfa_threshold = float(mfa_threshold)
+        self.validation_quantiles = validation_quantiles
+        self.train_quantiles = train_quantiles
+        self.meta = meta or {}
+        # Scores below edges[0] are allowed, up to and including the MFA
+        # threshold get MFA: searchsorted(side="right") counts the edges passed
+        self.edges = np.array([self.allow_threshold, np.nextafter(self.mfa_threshold, np.inf)])
+        self.percentiles = np.linspace(0.0, 100.0, len(validation_quantiles)) if validation_quantiles is not None else None
+
+    @classmethod
+    def fit(cls, train_scores, validation_scores, allow_percentile=ALLOW_PERCENTILE, mfa_percentile=MFA_PERCENTILE):
+        """Thresholds at the given percentiles of the validation risk scores."""
+        grid = np.linspace(0.0, 1.0, QUANTILE_POINTS)
+        validation_quantiles = np.quantile(validation_scores, grid)
+        train_quantiles = np.quantile(train_scores, grid)
+        allow_threshold, mfa_threshold = np.percentile(validation_scores, [allow_percentile, mfa_percentile])
+        return cls(allow_threshold, mfa_threshold, validation_quantiles, train_quantiles, meta={
+            "allow_percentile": allow_percentile,
+            "mfa_percentile": mfa_percentile,
+            "train_rows": len(train_scores),
+            "validation_rows": len(validation_scores)
+        })
+
+    def remapped(self, old_scores, new_scores):
+        """This calibration carried over to a changed forest, given both
+        forests' risk scores for the same logins. Each threshold and quantile
+        moves to the new score at the same rank among those logins, so it
+        keeps its percentile; outside their range it shifts with the nearest
+        end."""
+        old_scores, new_scores = np.sort(old_scores), np.sort(new_scores)
+
+        def remap(values):
+            if values is None:
+                return None
+            values = np.asarray(values, dtype=np.float64)
+            mapped = np.interp(values, old_scores, new_scores)
+            mapped = np.where(values < old_scores[0], values + (new_scores[0] - old_scores[0]), mapped)
+            return np.where(values > old_scores[-1], values + (new_scores[-1] - old_scores[-1]), mapped)
+
+        allow_threshold, mfa_threshold = remap([self.allow_threshold, self.mfa_threshold])
+        return Calibration(allow_threshold, mfa_threshold, remap(self.validation_quantiles), remap(self.train_quantiles),
+                           meta=dict(self.meta, remapped_rows=len(old_scores)))
+
+    def decisions(self, risk_scores):
+        """Model decision ("Allow", "MFA" or "Block") per risk score."""
+        return MODEL_DECISIONS[np.searchsorted(self.edges, risk_scores, side="right")]
+
+    def percentile_ranks(self, risk_scores):
+        """Share of validation logins (0-100) scoring at or below each risk
+        score; None without quantiles."""
+        if self.percentiles is None:
+            return None
+        return np.interp(risk_scores, self.validation_quantiles, self.percentiles)
+
+    def header_meta(self):
+        return dict(self.meta, allow_threshold=self.allow_threshold, mfa_threshold=self.mfa_threshold)
+
+    def to_arrays(self):
+        arrays = {}
+        if self.validation_quantiles is not None:
+            arrays["calibration.validation"] = np.asarray(self.validation_quantiles, dtype=np.float64)
+        if self.train_quantiles is not None:
+            arrays["calibration.train"] = np.asarray(self.train_quantiles, dtype=np.float64)
+        return arrays
+
+    @classmethod
+    def from_bundle(cls, meta, arrays):
+        """Calibration stored by write_bundle, or the fixed defaults."""
+        calibration = meta.get("calibration")
+        if not calibration:
+            return cls()
+        return cls(calibration["allow_threshold"], calibration["mfa_threshold"],
+                   arrays.get("calibration.validation"), arrays.get("calibration.train"), meta=calibration)
+
+    def save(self, path):
+        with open(path, "w") as f:
+            json.dump({
+                "meta": self.header_meta(),
+                "validation_quantiles": None if self.validation_quantiles is None else np.asarray(self.validation_quantiles).tolist(),
+                "train_quantiles": None if self.train_quantiles is None else np.asarray(self.train_quantiles).tolist()
+            }, f)
+
+    @classmethod
+    def load(cls, path):
+        """Calibration saved next to the trained pickles, or the defaults."""
+        if not os.path.exists(path):
+            return cls()
+        with open(path) as f:
+            data = json.load(f)
+        quantiles = {key: np.asarray(data[key]) if data[key] is not None else None
+                     for key in ("validation_quantiles", "train_quantiles")}
+        return cls(data["meta"]["allow_threshold"], data["meta"]["mfa_threshold"], meta=data["meta"], **quantiles)
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Calibrate the decision thresholds of an existing model bundle.")
+    parser.add_argument("--bundle", default="model_bundle.ifb", help="Bundle to calibrate (rewritten in place)")
+    parser.add_argument("--input", default="useractivityvariation5.csv", help="CSV the bundle was trained on")
+    parser.add_argument("--geo-mode", default="exact")
+    parser.add_argument("--validation-fraction", type=float, default=0.0,
+                        help="Share of rows to calibrate on, as if held out (default 0: all rows)")
+    parser.add_argument("--allow-percentile", type=float, default=ALLOW_PERCENTILE)
+    parser.add_argument("--mfa-percentile", type=float, default=MFA_PERCENTILE)
+    parser.add_argument("--seed", type=int, default=42)
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    import pandas as pd
+    from IF import build_features
+    from model_bundle import FEATURE_COLUMNS, load_bundle, read_bundle, write_bundle_arrays
+
+    args = parse_args(argv)
+    df, _, _ = build_features(pd.read_csv(args.input), args.geo_mode)
+    scores = load_bundle(args.bundle).risk_scores(df[FEATURE_COLUMNS].to_numpy())
+    if args.validation_fraction > 0:
+        validation = np.random.default_rng(args.seed).random(len(scores)) < args.validation_fraction
+        calibration = Calibration.fit(scores[~validation], scores[validation], args.allow_percentile, args.mfa_percentile)
+    else:
+        calibration = Calibration.fit(scores, scores, args.allow_percentile, args.mfa_percentile)
+
+    header, arrays = read_bundle(args.bundle)
+    arrays = {name: np.array(array) for name, array in arrays.items()}
+    arrays.update(calibration.to_arrays())
+    write_bundle_arrays(args.bundle, arrays, header["forest"], dict(header["meta"], calibration=calibration.header_meta()))
+    print(f"✅ Calibrated {args.bundle}: Allow below {calibration.allow_threshold:.4f}, "
+          f"MFA up to {calibration.mfa_threshold:.4f} ({calibration.meta['validation_rows']} validation rows)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,25 @@
+"""Database connection-pool settings shared by app.py and asgi_app.py, so
+both serving modes size their pools the same way."""
+import os
+
+def pool_config():
+    """DB_POOL_* settings from the environment, for app.config."""
+    return {
+        'DB_POOL_SIZE': int(os.environ.get('DB_POOL_SIZE', 10)),
+        'DB_MAX_OVERFLOW': int(os.environ.get('DB_MAX_OVERFLOW', 20)),
+        'DB_POOL_TIMEOUT': float(os.environ.get('DB_POOL_TIMEOUT', 30)),
+        'DB_POOL_RECYCLE': int(os.environ.get('DB_POOL_RECYCLE', 1800)),
+        'DB_POOL_PRE_PING': os.environ.get('DB_POOL_PRE_PING', '1') == '1'
+    }
+
+def engine_options(config, url):
+    """create_engine keyword arguments for a database URL. Pool sizing only
+    applies to server databases; SQLite keeps its default pool."""
+    options = {"pool_pre_ping": config['DB_POOL_PRE_PING'], "pool_recycle": config['DB_POOL_RECYCLE']}
+    if not url.startswith("sqlite"):
+        options.update(
+            pool_size=config['DB_POOL_SIZE'],
+            max_overflow=config['DB_MAX_OVERFLOW'],
+            pool_timeout=config['DB_POOL_TIMEOUT']
+        )
+    return options
@@ -0,0 +1,113 @@
+import numpy as np
+
+UNKNOWN = "Unknown"
+DEFAULT_IP_FREQUENCY = 0.0001
+
+class CategoryLookup:
+    """Dict-backed replacement for a fitted LabelEncoder.
+
+    Codes match LabelEncoder (index into the sorted classes). Values outside
+    the vocabulary map to the "Unknown" class when it was seen in training,
+    otherwise to an explicit unknown bucket one past the last class.
+    """
+
+    def __init__(self, classes):
+        self.classes_ = list(classes)
+        self.codes = {value: code for code, value in enumerate(self.classes_)}
+        self.unknown_code = self.codes.get(UNKNOWN, len(self.classes_))
+
+    @classmethod
+    def fit(cls, values):
+        return cls(np.unique(np.asarray(values)).tolist())
+
+    @classmethod
+    def from_label_encoder(cls, encoder):
+        return cls(encoder.classes_.tolist())
+
+    def to_label_encoder(self):
+        from sklearn.preprocessing import LabelEncoder
+        encoder = LabelEncoder()
+        encoder.classes_ = np.asarray(self.classes_)
+        return encoder
+
+    def __contains__(self, value):
+        return value in self.codes
+
+    def __len__(self):
+        return len(self.classes_)
+
+    def encode(self, value):
+        return self.codes.get(value, self.unknown_code)
+
+    def encode_many(self, values):
+        get, unknown = self.codes.get, self.unknown_code
+        return np.fromiter((get(value, unknown) for value in values), dtype=np.int64, count=len(values))
+
+def compile_encoders(label_encoders):
+    return {
+        col: encoder if isinstance(encoder, CategoryLookup) else CategoryLookup.from_label_encoder(encoder)
+        for col, encoder in label_encoders.items()
+    }
+
+def compile_ip_frequencies(ip_frequencies, label_encoders=None):
+    """Key the IP-frequency table by IP string.
+
+    Older training runs counted IPs after label encoding, so their table is
+    keyed by IPaddress codes; those are mapped back through the encoder.
+    Tables that already look IPs up (an IPFrequencySketch) pass through.
+    """
+    if hasattr(ip_frequencies, "get_many"):
+        return ip_frequencies
+    encoder = (label_encoders or {}).get("IPaddress")
+    table = {}
+    for ip, frequency in ip_frequencies.items():
+        if not isinstance(ip, str) and encoder is not None:
+            ip = encoder.classes_[int(ip)]
+        table[str(ip)] = float(frequency)
+    return table
+
+def ip_frequency(table, ip):
+    return table.get(ip, DEFAULT_IP_FREQUENCY)
+
+def ip_frequency_many(table, ips):
+    if hasattr(table, "get_many"):
+        return table.get_many(ips, DEFAULT_IP_FREQUENCY)
+    return np.fromiter((table.get(ip, DEFAULT_IP_FREQUENCY) for ip in ips), dtype=np.float64, count=len(ips))
+
+class SortedFrequencyTable:
+    """IP-frequency table over parallel sorted key/value arrays.
+
+    Lookups binary-search the keys, so the arrays can live in a read-only
+    memory map shared between worker processes.
+    """
+
+    def __init__(self, keys, values):
+        self.keys = keys
+        self.values = values
+
+    @classmethod
+    def from_dict(cls, table):
+        keys = np.array(sorted(table), dtype=str)
+        values = np.array([table[key] for key in keys.tolist()], dtype=np.float64)
+        return cls(keys, values)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def get(self, ip, default=None):
+        if not len(self.keys) or not isinstance(ip, str):
+            return default
+        i = int(np.searchsorted(self.keys, ip))
+        if i < len(self.keys) and self.keys[i] == ip:
+            return float(self.values[i])
+        return default
+
+    def get_many(self, ips, default):
+        ips = np.asarray(ips, dtype=str)
+        result = np.full(len(ips), default, dtype=np.float64)
+        if not len(self.keys) or not len(ips):
+            return result
+        i = np.minimum(np.searchsorted(self.keys, ips), len(self.keys) - 1)
+        found = self.keys[i] == ips
+        result[found] = self.values[i[found]]
+        return result
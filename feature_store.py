@@ -0,0 +1,90 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from collections import namedtuple
+import joblib
+import numpy as np
+from model_bundle import FEATURE_COLUMNS
+
+# Bump whenever build_features changes what it produces, so stale caches miss
+PIPELINE_VERSION = 2
+FEATURE_CACHE_DIR = ".feature_cache"
+
+# features is the (rows, FEATURE_COLUMNS) float64 matrix, index the original
+# CSV row number of each feature row
+FeatureTable = namedtuple("FeatureTable", ["features", "index", "ip_frequencies", "label_encoders", "key"])
+
+def file_digest(path, block_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def cache_key(path, geo_mode, time_format, ip_sketch=None):
+    params = {
+        "input": file_digest(path),
+        "pipeline_version": PIPELINE_VERSION,
+        "columns": FEATURE_COLUMNS,
+        "geo_mode": geo_mode,
+        "time_format": time_format
+    }
+    # Only sketch runs add the key, so exact-table entries keep their keys
+    if ip_sketch is not None:
+        params["ip_sketch"] = ip_sketch
+    params = json.dumps(params, sort_keys=True)
+    return hashlib.sha256(params.encode()).hexdigest()[:32]
+
+def read_entry(entry_dir, key):
+    """Load a cached feature table; the arrays are memory-mapped, not read."""
+    return FeatureTable(
+        features=np.load(os.path.join(entry_dir, "features.npy"), mmap_mode="r"),
+        index=np.load(os.path.join(entry_dir, "index.npy"), mmap_mode="r"),
+        ip_frequencies=joblib.load(os.path.join(entry_dir, "ip_frequencies.pkl")),
+        label_encoders=joblib.load(os.path.join(entry_dir, "label_encoders.pkl")),
+        key=key
+    )
+
+def write_entry(entry_dir, df, ip_frequencies, label_encoders, meta):
+    # Build in a sibling temp dir and rename, so readers never see half an entry
+    parent = os.path.dirname(entry_dir)
+    os.makedirs(parent, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(dir=parent, prefix=".tmp-")
+    try:
+        np.save(os.path.join(tmp_dir, "features.npy"), np.ascontiguousarray(df[FEATURE_COLUMNS].to_numpy(dtype=np.float64)))
+        np.save(os.path.join(tmp_dir, "index.npy"), df.index.to_numpy(dtype=np.int64))
+        joblib.dump(ip_frequencies, os.path.join(tmp_dir, "ip_frequencies.pkl"))
+        joblib.dump(label_encoders, os.path.join(tmp_dir, "label_encoders.pkl"))
+        with open(os.path.join(tmp_dir, "meta.json"), "w") as f:
+            json.dump(meta, f, indent=2)
+        os.rename(tmp_dir, entry_dir)
+    except OSError:
+        # Another run published the same entry first
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        if not os.path.isdir(entry_dir):
+            raise
+
+def load_features(path, geo_mode, time_format, cache_dir=FEATURE_CACHE_DIR, ip_sketch=None):
+    """Engineered features for the CSV at `path`, computed once per input
+    content, pipeline version and parameters and memory-mapped afterwards.
+    Returns (FeatureTable, hit)."""
+    key = cache_key(path, geo_mode, time_format, ip_sketch)
+    entry_dir = os.path.join(cache_dir, key)
+    if os.path.isdir(entry_dir):
+        return read_entry(entry_dir, key), True
+
+    import pandas as pd
+    from IF import build_features
+
+    df, ip_frequencies, label_encoders = build_features(pd.read_csv(path), geo_mode, time_format=time_format, ip_sketch=ip_sketch)
+    write_entry(entry_dir, df, ip_frequencies, label_encoders, meta={
+        "input": os.path.abspath(path),
+        "pipeline_version": PIPELINE_VERSION,
+        "geo_mode": geo_mode,
+        "time_format": time_format,
+        "ip_sketch": ip_sketch,
+        "rows": len(df)
+    })
+    return read_entry(entry_dir, key), False
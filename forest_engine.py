@@ -0,0 +1,141 @@
+import numpy as np
+
+# Array names making up a packed forest, in storage order
+FLAT_FOREST_ARRAYS = ["feature", "threshold", "children_left", "children_right", "leaf_value", "roots"]
+
+# Samples walked together per traversal pass
+SCORE_CHUNK_SIZE = 256
+
+def average_path_length(n_samples):
+    """Average path length of an unsuccessful BST search over n samples, as in
+    sklearn's IsolationForest."""
+    n_samples = np.asarray(n_samples, dtype=np.float64)
+    result = np.zeros_like(n_samples)
+    result[n_samples == 2] = 1.0
+    mask = n_samples > 2
+    result[mask] = 2.0 * (np.log(n_samples[mask] - 1.0) + np.euler_gamma) - 2.0 * (n_samples[mask] - 1.0) / n_samples[mask]
+    return result
+
+def export_forest(iso_forest):
+    """Pack a fitted IsolationForest into flat arrays indexed by global node id.
+
+    Leaves point at themselves so a fixed number of traversal steps leaves
+    every sample parked on its leaf, and each leaf stores its depth plus the
+    average path length of the samples it held during training.
+    """
+    features, thresholds, lefts, rights, leaf_values, roots = [], [], [], [], [], []
+    offset = 0
+    max_depth = 0
+
+    for estimator, estimator_features in zip(iso_forest.estimators_, iso_forest.estimators_features_):
+        tree = estimator.tree_
+        node_ids = np.arange(tree.node_count)
+        is_leaf = tree.children_left == -1
+
+        # Children always have larger ids than their parent
+        depth = np.zeros(tree.node_count)
+        for node in node_ids[~is_leaf]:
+            depth[tree.children_left[node]] = depth[tree.children_right[node]] = depth[node] + 1
+        max_depth = max(max_depth, int(depth.max()))
+
+        features.append(np.where(is_leaf, 0, np.asarray(estimator_features)[np.maximum(tree.feature, 0)]))
+        thresholds.append(np.where(is_leaf, np.inf, tree.threshold))
+        lefts.append(np.where(is_leaf, node_ids, tree.children_left) + offset)
+        rights.append(np.where(is_leaf, node_ids, tree.children_right) + offset)
+        leaf_values.append(np.where(is_leaf, depth + average_path_length(tree.n_node_samples), 0.0))
+        roots.append(offset)
+        offset += tree.node_count
+
+    arrays = {
+        "feature": np.concatenate(features).astype(np.int32),
+        "threshold": np.concatenate(thresholds).astype(np.float64),
+        "children_left": np.concatenate(lefts).astype(np.int32),
+        "children_right": np.concatenate(rights).astype(np.int32),
+        "leaf_value": np.concatenate(leaf_values).astype(np.float64),
+        "roots": np.asarray(roots, dtype=np.int32)
+    }
+    meta = {
+        "max_depth": max_depth,
+        "max_samples": int(iso_forest.max_samples_),
+        "offset": float(iso_forest.offset_),
+        "n_features": int(iso_forest.n_features_in_)
+    }
+    return arrays, meta
+
+def split_forest(arrays):
+    """Unpack packed forest arrays into one dict of arrays per tree, with node
+    ids relative to the tree's root."""
+    roots = arrays["roots"].astype(np.int64)
+    ends = np.append(roots[1:], len(arrays["feature"]))
+    trees = []
+    for start, end in zip(roots, ends):
+        tree = {name: np.array(arrays[name][start:end]) for name in FLAT_FOREST_ARRAYS if name != "roots"}
+        tree["children_left"] -= start
+        tree["children_right"] -= start
+        trees.append(tree)
+    return trees
+
+def join_forest(trees):
+    """Inverse of split_forest."""
+    offsets = np.cumsum([0] + [len(tree["feature"]) for tree in trees[:-1]])
+    arrays = {
+        name: np.concatenate([
+            tree[name] + offset if name.startswith("children") else tree[name] for tree, offset in zip(trees, offsets)
+        ]).astype(trees[0][name].dtype)
+        for name in FLAT_FOREST_ARRAYS if name != "roots"
+    }
+    arrays["roots"] = offsets.astype(np.int32)
+    return arrays
+
+class FlatForest:
+    """Isolation Forest scorer over packed arrays, walking all trees for a
+    whole batch at once. Drop-in for the sklearn model's scoring methods."""
+
+    def __init__(self, arrays, meta):
+        for name in FLAT_FOREST_ARRAYS:
+            setattr(self, name, arrays[name])
+        self.max_depth = meta["max_depth"]
+        self.max_samples = meta["max_samples"]
+        self.offset_ = meta["offset"]
+        self.n_features = meta["n_features"]
+        self._denominator = len(self.roots) * average_path_length([self.max_samples])[0]
+        # Interleaved (left, right) children so one gather picks the branch
+        self._children = np.stack([self.children_left, self.children_right], axis=1).ravel().astype(np.intp)
+        self._feature = self.feature.astype(np.intp)
+        self._roots = self.roots.astype(np.intp)
+
+    @classmethod
+    def from_sklearn(cls, iso_forest):
+        return cls(*export_forest(iso_forest))
+
+    def _path_lengths(self, X):
+        # One (sample, tree) cursor per entry, gathered from the flattened matrix
+        n_samples, n_trees = X.shape[0], len(self._roots)
+        flat_X = X.ravel()
+        row_offsets = np.repeat(np.arange(n_samples, dtype=np.intp) * self.n_features, n_trees)
+        nodes = np.tile(self._roots, n_samples)
+        for _ in range(self.max_depth):
+            go_right = ~(flat_X.take(row_offsets + self._feature.take(nodes)) <= self.threshold.take(nodes))
+            nodes = self._children.take(2 * nodes + go_right)
+        return self.leaf_value.take(nodes).reshape(n_samples, n_trees).sum(axis=1)
+
+    def score_samples(self, X):
+        # Trees split on float32 features, as in sklearn
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.n_features:
+            raise ValueError(f"Expected feature matrix with {self.n_features} columns, got shape {X.shape}")
+        if self._denominator == 0:
+            return -np.ones(X.shape[0])
+
+        # Walk in chunks small enough for the cursors to stay in cache
+        depths = np.concatenate([
+            self._path_lengths(X[start:start + SCORE_CHUNK_SIZE])
+            for start in range(0, X.shape[0], SCORE_CHUNK_SIZE)
+        ]) if X.shape[0] else np.zeros(0)
+        return -(2.0 ** (-depths / self._denominator))
+
+    def decision_function(self, X):
+        return self.score_samples(X) - self.offset_
+
+    def predict(self, X):
+        return np.where(self.decision_function(X) < 0, -1, 1)
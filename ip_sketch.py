@@ -0,0 +1,238 @@
+"""Fixed-memory IP frequency estimates with subnet back-off.
+
+Three count-min sketches count logins per full IP, per /24 and per /16
+prefix. Conservative update keeps the over-count low, and exponential decay
+by login time lets old traffic fade. Memory is 3 * depth * width counters,
+however many IPs are seen.
+
+An IP's frequency is its share of all (decayed) logins, as the exact table
+in ip_frequencies.pkl gives. An IP not seen yet falls back to a discounted
+share of its /24, then its /16, instead of the flat DEFAULT_IP_FREQUENCY.
+"""
+import threading
+import time
+import zlib
+import numpy as np
+from encoding import DEFAULT_IP_FREQUENCY
+
+# Levels of the sketch: full IP, /24, /16
+IP_LEVELS = ("ip", "/24", "/16")
+# Right shifts of an IPv4 address for each level
+LEVEL_SHIFTS = (0, 8, 16)
+# Multiplier applied to a subnet's share per level of back-off
+SUBNET_DISCOUNT = 0.1
+# A key counts as seen once its decayed count reaches this many logins
+MIN_SEEN_COUNT = 0.5
+# Rescale the counters once new weights reach 2 ** this
+MAX_WEIGHT_EXPONENT = 32
+# Non-IPv4 keys (IPv6, garbage) live above the 32-bit address space
+NON_IPV4_FLAG = 1 << 32
+
+_MASK64 = (1 << 64) - 1
+
+def ip_key(ip):
+    """(key, is_ipv4): the IPv4 address as an integer, otherwise a crc32 of
+    the string tagged with NON_IPV4_FLAG."""
+    parts = str(ip).split(".")
+    if len(parts) == 4:
+        try:
+            octets = [int(part) for part in parts]
+        except ValueError:
+            octets = None
+        if octets and all(0 <= octet <= 255 for octet in octets):
+            return (octets[0] << 24) | (octets[1] << 16) | (octets[2] << 8) | octets[3], True
+    return NON_IPV4_FLAG | zlib.crc32(str(ip).encode("utf-8")), False
+
+def ip_keys(ips):
+    keys = np.empty(len(ips), dtype=np.uint64)
+    ipv4 = np.empty(len(ips), dtype=bool)
+    for i, ip in enumerate(ips):
+        keys[i], ipv4[i] = ip_key(ip)
+    return keys, ipv4
+
+class IPFrequencySketch:
+    """Count-min sketches of login counts per IP, /24 and /16.
+
+    Counts are stored scaled by 2 ** ((t - epoch) / half_life), so decaying
+    everything is free: a login at time t adds that weight, and a count is
+    read back relative to the weight of the latest login. half_life=0 turns
+    decay off. Frequencies are ratios of counts, so the scale cancels.
+    """
+
+    def __init__(self, width=1 << 15, depth=4, half_life=0.0, seed=42, counts=None, hashes=None, state=None):
+        if width & (width - 1):
+            raise ValueError("Error: IP sketch width must be a power of two!")
+        self.width = width
+        self.depth = depth
+        self._shift = 64 - (width.bit_length() - 1)
+        if hashes is None:
+            # Odd multipliers and offsets for multiply-shift hashing, per level and row
+            rng = np.random.default_rng(seed)
+            hashes = rng.integers(0, 1 << 63, size=(len(IP_LEVELS), depth, 2), dtype=np.uint64) * np.uint64(2)
+            hashes[..., 0] |= np.uint64(1)
+        self.hashes = hashes
+        # The same hashes as Python ints, for single lookups
+        self._hash_ints = [[(int(a), int(b)) for a, b in level] for level in hashes]
+        self.counts = counts if counts is not None else np.zeros((len(IP_LEVELS), depth, width))
+        # total (scaled), epoch and latest login time (epoch seconds), half-life (seconds)
+        total, epoch, latest, stored_half_life = state if state is not None else (0.0, np.nan, np.nan, half_life)
+        self.total = float(total)
+        self.epoch = float(epoch)
+        self.latest = float(latest)
+        self.half_life = float(stored_half_life)
+        self._writable = counts is None
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        """Sketch over the "ipsketch.*" bundle arrays. They may be read-only
+        views of the bundle; the counters are copied on the first update."""
+        counts = arrays["ipsketch.counts"]
+        return cls(width=counts.shape[2], depth=counts.shape[1], counts=counts,
+                   hashes=arrays["ipsketch.hashes"], state=arrays["ipsketch.state"].tolist())
+
+    def to_arrays(self):
+        with self._lock:
+            return {
+                "ipsketch.counts": np.array(self.counts),
+                "ipsketch.hashes": np.array(self.hashes),
+                "ipsketch.state": np.array([self.total, self.epoch, self.latest, self.half_life])
+            }
+
+    @property
+    def nbytes(self):
+        return self.counts.nbytes + self.hashes.nbytes
+
+    def stats(self):
+        return {"width": self.width, "depth": self.depth, "half_life": self.half_life,
+                "logins": self.current_count(self.total), "bytes": self.nbytes}
+
+    def _weights(self, when):
+        """Scaled weight of a login at each time, rescaling the counters first
+        if the newest weight would grow too large."""
+        if not self.half_life:
+            return np.ones(len(when))
+        if np.isnan(self.epoch):
+            self.epoch = float(np.min(when))
+        exponent = (np.asarray(when, dtype=np.float64) - self.epoch) / self.half_life
+        if exponent.max() > MAX_WEIGHT_EXPONENT:
+            shift = float(np.floor(exponent.max()))
+            factor = 2.0 ** -shift
+            self.counts *= factor
+            self.total *= factor
+            self.epoch += shift * self.half_life
+            exponent -= shift
+        return np.exp2(exponent)
+
+    def current_count(self, scaled):
+        """A scaled count in logins as of the latest update."""
+        if not self.half_life or np.isnan(self.latest):
+            return scaled
+        return scaled / 2.0 ** ((self.latest - self.epoch) / self.half_life)
+
+    def _slots(self, level, prefixes):
+        """Counter index of each prefix in every row: (depth, len(prefixes))."""
+        hashes = self.hashes[level]
+        with np.errstate(over="ignore"):
+            return ((prefixes[None, :] * hashes[:, 0:1] + hashes[:, 1:2]) >> np.uint64(self._shift)).astype(np.intp)
+
+    def update_many(self, ips, when=None, advance=True):
+        """Count one login per IP at `when` (epoch seconds, scalar or one per
+        IP; default now).
+
+        With advance=False logins after the latest one counted so far are
+        counted at that time instead: they add one login's weight each and
+        cannot age the existing counts. Serving uses this between refreshes,
+        where a wall-clock login months after the training data would
+        otherwise outweigh all of it.
+        """
+        if not len(ips):
+            return
+        keys, ipv4 = ip_keys(ips)
+        when = np.broadcast_to(np.asarray(time.time() if when is None else when, dtype=np.float64), (len(keys),))
+        with self._lock:
+            if not advance and not np.isnan(self.latest):
+                when = np.minimum(when, self.latest)
+            if not self._writable:
+                self.counts = np.array(self.counts)
+                self._writable = True
+            weights = self._weights(when)
+            for level in range(len(IP_LEVELS)):
+                level_keys, level_weights = (keys, weights) if level == 0 else (keys[ipv4], weights[ipv4])
+                if not len(level_keys):
+                    continue
+                # Conservative update: raise each counter only as far as the key's new estimate
+                prefixes, inverse = np.unique(level_keys >> np.uint64(LEVEL_SHIFTS[level]), return_inverse=True)
+                added = np.bincount(inverse.ravel(), weights=level_weights, minlength=len(prefixes))
+                slots = self._slots(level, prefixes)
+                counts = self.counts[level]
+                rows = np.arange(self.depth)[:, None]
+                estimate = counts[rows, slots].min(axis=0) + added
+                for row in range(self.depth):
+                    np.maximum.at(counts[row], slots[row], estimate)
+            self.total += float(weights.sum())
+            if self.half_life:
+                self.latest = float(np.nanmax([self.latest, when.max()]))
+
+    def update(self, ip, when=None, advance=True):
+        self.update_many([ip], when, advance)
+
+    def estimates(self, ips):
+        """Scaled count estimates per level: (3, len(ips)), NaN for the
+        subnets of non-IPv4 keys."""
+        keys, ipv4 = ip_keys(ips)
+        result = np.full((len(IP_LEVELS), len(keys)), np.nan)
+        counts = self.counts
+        rows = np.arange(self.depth)[:, None]
+        for level in range(len(IP_LEVELS)):
+            mask = slice(None) if level == 0 else ipv4
+            slots = self._slots(level, keys[mask] >> np.uint64(LEVEL_SHIFTS[level]))
+            result[level, mask] = counts[level][rows, slots].min(axis=0)
+        return result
+
+    def get_many(self, ips, default=DEFAULT_IP_FREQUENCY):
+        """Frequency per IP: its own share once seen, otherwise the
+        discounted share of its /24 or /16 (never below `default`)."""
+        result = np.full(len(ips), default, dtype=np.float64)
+        if not len(ips) or self.total <= 0:
+            return result
+        estimates = self.estimates(ips)
+        shares = estimates / self.total
+        seen = self.current_count(estimates) >= MIN_SEEN_COUNT
+        backoff = np.full(len(ips), default, dtype=np.float64)
+        for level in range(1, len(IP_LEVELS)):
+            subnet = seen[level] & (SUBNET_DISCOUNT ** level * shares[level] > backoff)
+            backoff[subnet] = SUBNET_DISCOUNT ** level * shares[level][subnet]
+        return np.where(seen[0], shares[0], backoff)
+
+    def get(self, ip, default=None):
+        """get_many() for one IP, in plain Python (no array round trips)."""
+        if not isinstance(ip, str):
+            return default
+        default = DEFAULT_IP_FREQUENCY if default is None else default
+        if self.total <= 0:
+            return default
+        key, ipv4 = ip_key(ip)
+        counts = self.counts
+        unit = self.current_count(1.0)
+        frequency = default
+        for level in range(len(IP_LEVELS) if ipv4 else 1):
+            prefix = key >> LEVEL_SHIFTS[level]
+            estimate = min(counts[level, row, ((prefix * a + b) & _MASK64) >> self._shift]
+                           for row, (a, b) in enumerate(self._hash_ints[level]))
+            if estimate * unit < MIN_SEEN_COUNT:
+                continue
+            share = float(estimate) / self.total
+            if level == 0:
+                return share
+            frequency = max(frequency, SUBNET_DISCOUNT ** level * share)
+        return frequency
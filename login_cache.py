@@ -0,0 +1,84 @@
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+# Snapshot of the fields /predict compares against the previous login
+LastLogin = namedtuple("LastLogin", ["IPaddress", "DeviceInfo", "Timezone", "Latitude", "Longitude", "LoginTime"])
+
+MISSING = object()
+
+def snapshot(attempt):
+    if attempt is None:
+        return None
+    return LastLogin(
+        attempt.IPaddress, attempt.DeviceInfo, attempt.Timezone,
+        attempt.Latitude, attempt.Longitude, attempt.LoginTime
+    )
+
+def snapshot_row(row):
+    if row is None:
+        return None
+    return LastLogin(*(row[field] for field in LastLogin._fields))
+
+class LastLoginCache:
+    """Bounded LRU cache of each user's last accepted login with a TTL.
+
+    A cached value of None records that the user has no previous login, so
+    first-time users do not hit the database on every attempt either.
+    """
+
+    def __init__(self, maxsize=100000, ttl=300.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, userID):
+        with self._lock:
+            entry = self._entries.get(userID)
+            if entry is None:
+                self.misses += 1
+                return MISSING
+            value, stored_at = entry
+            if self.ttl is not None and time.monotonic() - stored_at > self.ttl:
+                del self._entries[userID]
+                self.expirations += 1
+                self.misses += 1
+                return MISSING
+            self._entries.move_to_end(userID)
+            self.hits += 1
+            return value
+
+    def put(self, userID, value):
+        with self._lock:
+            self._entries[userID] = (value, time.monotonic())
+            self._entries.move_to_end(userID)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, userID):
+        with self._lock:
+            self._entries.pop(userID, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hit_rate": self.hits / lookups if lookups else 0.0
+            }
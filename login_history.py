@@ -0,0 +1,241 @@
+import threading
+import zlib
+from collections import OrderedDict, namedtuple
+from datetime import datetime
+import numpy as np
+import pandas as pd
+
+# Sequential features of a login against the user's recent history
+HistoryFeatures = namedtuple("HistoryFeatures", ["new_device", "distinct_timezones_24h", "logins_24h"])
+HISTORY_COLUMNS = list(HistoryFeatures._fields)
+
+HISTORY_WINDOW_SECONDS = 24 * 3600.0
+_EPOCH = datetime(1970, 1, 1)
+
+def epoch_seconds(login_time):
+    # LoginTime is naive UTC everywhere, so avoid datetime.timestamp()'s local-time reading
+    return (login_time - _EPOCH).total_seconds()
+
+# Marks ring-buffer entries outside the window; interned codes start at 0
+_NO_CODE = -2
+
+def _distinct_per_row(codes, extra):
+    """Distinct values per row of `codes` plus `extra`, ignoring _NO_CODE."""
+    values = np.sort(np.column_stack([codes, extra]), axis=1)
+    present = values != _NO_CODE
+    return present[:, 0] + (present[:, 1:] & (values[:, 1:] != values[:, :-1])).sum(axis=1)
+
+class _Shard:
+    """Ring buffers for the users hashed to one shard: one row of each array
+    per user, `capacity` logins per row."""
+
+    def __init__(self, capacity, max_users):
+        self.capacity = capacity
+        self.max_users = max_users
+        self.lock = threading.Lock()
+        self.slots = OrderedDict()
+        self.free = []
+        self.times = np.zeros((0, capacity))
+        self.devices = np.zeros((0, capacity), dtype=np.int32)
+        self.timezones = np.zeros((0, capacity), dtype=np.int32)
+        self.heads = np.zeros(0, dtype=np.int64)
+        self.evictions = 0
+
+    def _grow(self):
+        old = len(self.heads)
+        new = min(max(64, old * 2), self.max_users)
+        self.times = np.resize(self.times, (new, self.capacity))
+        self.devices = np.resize(self.devices, (new, self.capacity))
+        self.timezones = np.resize(self.timezones, (new, self.capacity))
+        self.heads = np.resize(self.heads, new)
+        self.free.extend(range(new - 1, old - 1, -1))
+
+    def slot(self, userID, create):
+        slot = self.slots.get(userID)
+        if slot is not None:
+            self.slots.move_to_end(userID)
+            return slot
+        if not create:
+            return None
+        if not self.free:
+            if len(self.heads) < self.max_users:
+                self._grow()
+            else:
+                # Least recently used user gives up its row
+                _, evicted = self.slots.popitem(last=False)
+                self.free.append(evicted)
+                self.evictions += 1
+        slot = self.free.pop()
+        self.heads[slot] = 0
+        self.slots[userID] = slot
+        return slot
+
+    def append(self, slot, login_time, device, timezone):
+        position = self.heads[slot] % self.capacity
+        self.times[slot, position] = login_time
+        self.devices[slot, position] = device
+        self.timezones[slot, position] = timezone
+        self.heads[slot] += 1
+
+class LoginHistory:
+    """Each user's last `capacity` logins in array-backed ring buffers,
+    sharded by crc32(userID) with one lock per shard.
+
+    Only the login time, device and timezone are kept (as interned codes), so
+    a user costs 16 bytes per remembered login. Shards evict their least
+    recently used users once they hold `max_users_per_shard`.
+
+    Devices and timezones come from clients, so at most `max_values` of them
+    are interned (None for no limit). Past that, new values are stored as
+    -1, like a value never seen: they never count as a known device.
+    """
+
+    def __init__(self, capacity=10, shards=16, max_users_per_shard=65536, max_values=65536):
+        self.capacity = capacity
+        self.max_values = max_values
+        self._shards = [_Shard(capacity, max_users_per_shard) for _ in range(shards)]
+        self._codes = {}
+        self._codes_lock = threading.Lock()
+        self.uninterned = 0
+
+    def _shard(self, userID):
+        return self._shards[zlib.crc32(str(userID).encode("utf-8")) % len(self._shards)]
+
+    def _code(self, value):
+        code = self._codes.get(value)
+        if code is None:
+            with self._codes_lock:
+                code = self._codes.get(value)
+                if code is None:
+                    if self.max_values is not None and len(self._codes) >= self.max_values:
+                        self.uninterned += 1
+                        return -1
+                    code = self._codes[value] = len(self._codes)
+        return code
+
+    def __contains__(self, userID):
+        shard = self._shard(userID)
+        with shard.lock:
+            return userID in shard.slots
+
+    def record(self, userID, login_time, device, timezone, create=True):
+        """Append a login; `login_time` is in epoch seconds. With create=False
+        users without a history yet are skipped."""
+        device, timezone = self._code(device), self._code(timezone)
+        shard = self._shard(userID)
+        with shard.lock:
+            slot = shard.slot(userID, create=create)
+            if slot is not None:
+                shard.append(slot, login_time, device, timezone)
+
+    def load(self, userID, logins):
+        """Replace a user's history with (login_time, device, timezone)
+        tuples, oldest first."""
+        logins = [(t, self._code(device), self._code(timezone)) for t, device, timezone in logins]
+        shard = self._shard(userID)
+        with shard.lock:
+            slot = shard.slot(userID, create=True)
+            shard.heads[slot] = 0
+            for login in logins[-self.capacity:]:
+                shard.append(slot, *login)
+
+    def features(self, userID, login_time, device, timezone, window_seconds=HISTORY_WINDOW_SECONDS):
+        """HistoryFeatures of a login against the logins recorded before it:
+        whether the device is absent from the last `capacity` logins, distinct
+        timezones (this login included) and earlier logins within the window."""
+        device_code, timezone_code = self._codes.get(device, -1), self._codes.get(timezone, -1)
+        shard = self._shard(userID)
+        with shard.lock:
+            slot = shard.slot(userID, create=False)
+            if slot is None:
+                return HistoryFeatures(0, 1, 0)
+            n = min(int(shard.heads[slot]), self.capacity)
+            times = shard.times[slot, :n]
+            devices = shard.devices[slot, :n]
+            timezones = shard.timezones[slot, :n]
+            recent = (times <= login_time) & (login_time - times <= window_seconds)
+            new_device = int(n > 0 and not (device_code >= 0 and (devices == device_code).any()))
+            distinct_timezones = len(set(timezones[recent].tolist()) | {timezone_code})
+            return HistoryFeatures(new_device, distinct_timezones, int(recent.sum()))
+
+    def features_many(self, userIDs, login_times, devices, timezones, window_seconds=HISTORY_WINDOW_SECONDS):
+        """features() for many logins at once, as an (n, len(HISTORY_COLUMNS))
+        int64 array. Every login is compared with the history as it stands,
+        so a user should appear once per call."""
+        n = len(userIDs)
+        result = np.zeros((n, len(HISTORY_COLUMNS)), dtype=np.int64)
+        result[:, 1] = 1
+        login_times = np.asarray(login_times, dtype=np.float64)
+        device_codes = np.fromiter((self._codes.get(device, -1) for device in devices), dtype=np.int64, count=n)
+        timezone_codes = np.fromiter((self._codes.get(timezone, -1) for timezone in timezones), dtype=np.int64, count=n)
+        shard_ids = np.fromiter((zlib.crc32(str(userID).encode("utf-8")) % len(self._shards) for userID in userIDs),
+                                dtype=np.int64, count=n)
+        for k in np.unique(shard_ids):
+            rows = np.flatnonzero(shard_ids == k)
+            shard = self._shards[k]
+            with shard.lock:
+                slots = np.fromiter((-1 if slot is None else slot for slot in
+                                     (shard.slot(userIDs[i], create=False) for i in rows)), dtype=np.int64, count=len(rows))
+                rows, slots = rows[slots >= 0], slots[slots >= 0]
+                counts = np.minimum(shard.heads[slots], self.capacity)
+                times, devices_seen, timezones_seen = shard.times[slots], shard.devices[slots], shard.timezones[slots]
+            if not len(rows):
+                continue
+            valid = np.arange(self.capacity) < counts[:, None]
+            login_time = login_times[rows, None]
+            recent = valid & (times <= login_time) & (login_time - times <= window_seconds)
+            known = valid & (devices_seen == device_codes[rows, None]) & (device_codes[rows, None] >= 0)
+            result[rows, 0] = (counts > 0) & ~known.any(axis=1)
+            result[rows, 1] = _distinct_per_row(np.where(recent, timezones_seen, _NO_CODE), timezone_codes[rows])
+            result[rows, 2] = recent.sum(axis=1)
+        return result
+
+    def record_many(self, userIDs, login_times, devices, timezones, create=True):
+        """record() for many logins, in order."""
+        for login in zip(userIDs, login_times, devices, timezones):
+            self.record(*login, create=create)
+
+    def stats(self):
+        users = evictions = 0
+        for shard in self._shards:
+            with shard.lock:
+                users += len(shard.slots)
+                evictions += shard.evictions
+        return {
+            "users": users,
+            "capacity": self.capacity,
+            "shards": len(self._shards),
+            "evictions": evictions,
+            "interned_values": len(self._codes),
+            "uninterned_values": self.uninterned
+        }
+
+def history_features(userIDs, login_times, devices, timezones, capacity=10, window_seconds=HISTORY_WINDOW_SECONDS):
+    """HISTORY_COLUMNS for a log of logins, as serving computes them when
+    every login is recorded. Each user's logins are replayed in time order
+    through a LoginHistory, one login per user per round, so offline and
+    online features come from the same code. `login_times` are epoch
+    seconds; rows without one get zeros. Returns an array in input order."""
+    seconds = np.asarray(login_times, dtype=np.float64)
+    users = np.asarray(userIDs, dtype=object)
+    devices, timezones = np.asarray(devices, dtype=object), np.asarray(timezones, dtype=object)
+    columns = np.zeros((len(seconds), len(HISTORY_COLUMNS)), dtype=np.int64)
+    timed = np.flatnonzero(~np.isnan(seconds))
+    if not len(timed):
+        return columns
+    user_codes = pd.factorize(users[timed])[0]
+    order = np.lexsort((seconds[timed], user_codes))
+    rows, user_codes = timed[order], user_codes[order]
+    # Position of each login within its user's logins
+    starts = np.flatnonzero(np.r_[True, user_codes[1:] != user_codes[:-1]])
+    occurrence = np.arange(len(rows)) - np.repeat(starts, np.diff(np.r_[starts, len(rows)]))
+    by_round = np.argsort(occurrence, kind="stable")
+    bounds = np.searchsorted(occurrence[by_round], np.arange(occurrence.max() + 2))
+
+    history = LoginHistory(capacity=capacity, shards=1, max_users_per_shard=len(starts), max_values=None)
+    for lo, hi in zip(bounds[:-1], bounds[1:]):
+        batch = rows[by_round[lo:hi]]
+        args = users[batch], seconds[batch], devices[batch], timezones[batch]
+        columns[batch] = history.features_many(*args, window_seconds=window_seconds)
+        history.record_many(*args)
+    return columns
@@ -0,0 +1,175 @@
+import cProfile
+import os
+import random
+import threading
+import time
+from contextlib import nullcontext
+import numpy as np
+
+# Histogram bucket upper bounds in seconds
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUANTILES = (0.5, 0.95, 0.99)
+
+_NULL_TIMER = nullcontext()
+
+class Histogram:
+    """Cumulative bucket counts plus a ring buffer of recent samples for
+    exact p50/p95/p99 over the latest window."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS, window=4096):
+        self.buckets = np.asarray(buckets)
+        self.counts = np.zeros(len(buckets) + 1, dtype=np.int64)
+        self.sum = 0.0
+        self.count = 0
+        self._recent = np.zeros(window)
+        self._recent_len = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        with self._lock:
+            self.counts[np.searchsorted(self.buckets, value)] += 1
+            self.sum += value
+            self._recent[self.count % len(self._recent)] = value
+            self.count += 1
+            self._recent_len = min(self._recent_len + 1, len(self._recent))
+
+    def snapshot(self):
+        with self._lock:
+            recent = self._recent[:self._recent_len].copy()
+            return np.cumsum(self.counts), self.sum, self.count, recent
+
+    def quantiles(self, quantiles=QUANTILES):
+        _, _, _, recent = self.snapshot()
+        if not len(recent):
+            return {q: 0.0 for q in quantiles}
+        return dict(zip(quantiles, np.quantile(recent, quantiles).tolist()))
+
+class _Timer:
+    __slots__ = ("histogram", "start")
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start)
+        return False
+
+class StageMetrics:
+    """Per-stage latency histograms for the scoring hot path. When disabled,
+    `time()` hands back a shared no-op context manager."""
+
+    def __init__(self, enabled=True, prefix="risk"):
+        self.enabled = enabled
+        self.prefix = prefix
+        self.histograms = {}
+        self._lock = threading.Lock()
+
+    def histogram(self, stage):
+        histogram = self.histograms.get(stage)
+        if histogram is None:
+            with self._lock:
+                histogram = self.histograms.setdefault(stage, Histogram())
+        return histogram
+
+    def time(self, stage):
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self.histogram(stage))
+
+    def observe(self, stage, seconds):
+        if self.enabled:
+            self.histogram(stage).observe(seconds)
+
+    def summary(self):
+        return {stage: histogram.quantiles() for stage, histogram in sorted(self.histograms.items())}
+
+    def render_prometheus(self, gauges=None, histograms=None):
+        """Prometheus text exposition of the stage histograms, recent-window
+        quantiles, any extra {name: (type, help, value)} metrics and any
+        extra {name: (help, Histogram)} histograms."""
+        name = f"{self.prefix}_stage_duration_seconds"
+        recent_name = f"{self.prefix}_stage_recent_duration_seconds"
+        lines = [f"# HELP {name} Latency of each scoring stage.", f"# TYPE {name} histogram"]
+        recent_lines = [f"# HELP {recent_name} Latency quantiles over the most recent samples of each stage.",
+                        f"# TYPE {recent_name} summary"]
+
+        for stage, histogram in sorted(self.histograms.items()):
+            cumulative, total, count, recent = histogram.snapshot()
+            for bound, bucket_count in zip(histogram.buckets, cumulative):
+                lines.append(f'{name}_bucket{{stage="{stage}",le="{bound:g}"}} {bucket_count}')
+            lines.append(f'{name}_bucket{{stage="{stage}",le="+Inf"}} {count}')
+            lines.append(f'{name}_sum{{stage="{stage}"}} {total:.9g}')
+            lines.append(f'{name}_count{{stage="{stage}"}} {count}')
+
+            values = np.quantile(recent, QUANTILES) if len(recent) else np.zeros(len(QUANTILES))
+            for q, value in zip(QUANTILES, values):
+                recent_lines.append(f'{recent_name}{{stage="{stage}",quantile="{q:g}"}} {value:.9g}')
+            recent_lines.append(f'{recent_name}_sum{{stage="{stage}"}} {recent.sum():.9g}')
+            recent_lines.append(f'{recent_name}_count{{stage="{stage}"}} {len(recent)}')
+
+        lines.extend(recent_lines)
+        for metric, (help_text, histogram) in (histograms or {}).items():
+            cumulative, total, count, _ = histogram.snapshot()
+            lines.append(f"# HELP {self.prefix}_{metric} {help_text}")
+            lines.append(f"# TYPE {self.prefix}_{metric} histogram")
+            for bound, bucket_count in zip(histogram.buckets, cumulative):
+                lines.append(f'{self.prefix}_{metric}_bucket{{le="{bound:g}"}} {bucket_count}')
+            lines.append(f'{self.prefix}_{metric}_bucket{{le="+Inf"}} {count}')
+            lines.append(f"{self.prefix}_{metric}_sum {total:.9g}")
+            lines.append(f"{self.prefix}_{metric}_count {count}")
+        for metric, (metric_type, help_text, value) in (gauges or {}).items():
+            lines.append(f"# HELP {self.prefix}_{metric} {help_text}")
+            lines.append(f"# TYPE {self.prefix}_{metric} {metric_type}")
+            # A dict value maps a label string such as 'endpoint="predict"' to a sample
+            for labels, sample in (value.items() if isinstance(value, dict) else [(None, value)]):
+                label_part = f"{{{labels}}}" if labels else ""
+                lines.append(f"{self.prefix}_{metric}{label_part} {float(sample):.9g}")
+        return "\n".join(lines) + "\n"
+
+class RequestProfiler:
+    """cProfile hook for sampled requests. A request is profiled when the
+    sample rate fires or it carries the trigger header (if the caller allows
+    it); stats are written to `output_dir` as .prof files for snakeviz/pstats,
+    keeping only the newest `max_files`."""
+
+    def __init__(self, output_dir, sample_rate=0.0, header="X-Profile", max_files=100):
+        self.output_dir = output_dir
+        self.sample_rate = sample_rate
+        self.header = header
+        self.max_files = max_files
+
+    def should_profile(self, headers, allow_header=False):
+        if allow_header and headers.get(self.header) == "1":
+            return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def start(self):
+        profiler = cProfile.Profile()
+        profiler.enable()
+        return profiler
+
+    def finish(self, profiler, label):
+        profiler.disable()
+        os.makedirs(self.output_dir, exist_ok=True)
+        safe_label = "".join(c if c.isalnum() else "_" for c in label).strip("_")
+        path = os.path.join(self.output_dir, f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{safe_label}-{time.perf_counter_ns()}.prof")
+        profiler.dump_stats(path)
+        self.prune()
+        return path
+
+    def prune(self):
+        """Delete the oldest .prof files beyond max_files."""
+        try:
+            paths = [entry for entry in os.scandir(self.output_dir) if entry.name.endswith(".prof")]
+            paths.sort(key=lambda entry: entry.stat().st_mtime_ns)
+        except OSError:
+            return
+        for entry in paths[:max(len(paths) - self.max_files, 0)]:
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
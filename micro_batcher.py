@@ -0,0 +1,110 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from metrics import Histogram
+
+# Histogram bucket upper bounds for the number of items per batch
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512)
+
+class MicroBatcher:
+    """Coalesces concurrent scoring calls into one `score_fn` call.
+
+    Callers submit single items and get a Future back. A scoring thread
+    takes everything queued once `max_batch_size` items are waiting or the
+    oldest has waited `max_wait` seconds, calls `score_fn(items)` (which
+    returns one result per item, in order) and resolves the futures. A lone
+    request therefore pays at most `max_wait` of extra latency.
+    """
+
+    def __init__(self, score_fn, max_batch_size=64, max_wait=0.002):
+        self._score_fn = score_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+
+        self._items = deque()
+        self._cond = threading.Condition()
+        self._thread = None
+        self._stopping = False
+
+        self.batch_sizes = Histogram(buckets=BATCH_SIZE_BUCKETS)
+        self.queue_delay = Histogram()
+        self.failures = 0
+
+    def start(self):
+        with self._cond:
+            if self._thread is None:
+                self._stopping = False
+                self._thread = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+                self._thread.start()
+        return self
+
+    def submit(self, item):
+        return self.submit_many([item])[0]
+
+    def submit_many(self, items):
+        futures = [Future() for _ in items]
+        now = time.perf_counter()
+        with self._cond:
+            if self._stopping or self._thread is None:
+                raise RuntimeError("micro-batcher is not running")
+            self._items.extend((now, item, future) for item, future in zip(items, futures))
+            self._cond.notify_all()
+        return futures
+
+    def score(self, item, timeout=None):
+        return self.submit(item).result(timeout)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._items:
+                    if self._stopping:
+                        return
+                    self._cond.wait()
+                deadline = self._items[0][0] + self.max_wait
+                while len(self._items) < self.max_batch_size and not self._stopping:
+                    remaining = deadline - time.perf_counter()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                batch = [self._items.popleft() for _ in range(min(self.max_batch_size, len(self._items)))]
+
+            start = time.perf_counter()
+            self.batch_sizes.observe(len(batch))
+            for submitted, _, _ in batch:
+                self.queue_delay.observe(start - submitted)
+            try:
+                results = self._score_fn([item for _, item, _ in batch])
+            except Exception as e:
+                self.failures += 1
+                for _, _, future in batch:
+                    future.set_exception(e)
+                continue
+            for (_, _, future), result in zip(batch, results):
+                future.set_result(result)
+
+    def stop(self, timeout=10.0):
+        """Score everything still queued and stop the scoring thread."""
+        with self._cond:
+            thread = self._thread
+            self._stopping = True
+            self._cond.notify_all()
+        if thread is not None:
+            thread.join(timeout)
+        with self._cond:
+            self._thread = None
+
+    def stats(self):
+        _, _, batches, _ = self.batch_sizes.snapshot()
+        _, _, items, _ = self.queue_delay.snapshot()
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait": self.max_wait,
+            "batches": batches,
+            "items": items,
+            "failures": self.failures,
+            "mean_batch_size": items / batches if batches else 0.0,
+            "batch_size_quantiles": self.batch_sizes.quantiles(),
+            "queue_delay_quantiles": self.queue_delay.quantiles()
+        }
@@ -0,0 +1,163 @@
+import json
+import os
+import numpy as np
+from calibration import Calibration
+from forest_engine import FlatForest, export_forest
+from encoding import SortedFrequencyTable, compile_encoders, compile_ip_frequencies
+from ip_sketch import IPFrequencySketch
+
+# Column order of the feature matrix the scaler and forest were trained on
+FEATURE_COLUMNS = ["Latitude", "Longitude", "TypingSpeed", "MouseSpeed", "geo_velocity", "login_hour", "ip_frequency"]
+CATEGORICAL_COLUMNS = ["Timezone", "DeviceInfo"]
+
+BUNDLE_MAGIC = b"IFBUNDLE"
+BUNDLE_VERSION = 1
+# Arrays start on cache-line boundaries
+BUNDLE_ALIGNMENT = 64
+
+class BundleError(ValueError):
+    pass
+
+class MinMaxTransform:
+    """MinMaxScaler.transform over stored min_/scale_ arrays."""
+
+    def __init__(self, min_, scale_):
+        self.min_ = min_
+        self.scale_ = scale_
+
+    def transform(self, X):
+        return np.asarray(X, dtype=np.float64) * self.scale_ + self.min_
+
+class ModelArtifacts:
+    """Everything needed to turn a feature matrix into risk scores."""
+
+    def __init__(self, forest, scaler, ip_frequency_table, meta=None, calibration=None):
+        self.forest = forest
+        self.scaler = scaler
+        self.ip_frequency_table = ip_frequency_table
+        self.meta = meta or {}
+        self.calibration = calibration or Calibration()
+
+    def risk_scores(self, feature_matrix):
+        return -self.forest.decision_function(self.scaler.transform(feature_matrix))
+
+def write_bundle(path, iso_forest, scaler, label_encoders, ip_frequencies, meta=None, calibration=None):
+    """Write the forest, scaler, encoder vocabularies, IP-frequency table
+    (or IPFrequencySketch) and decision calibration to one versioned file:
+    a JSON header followed by aligned raw arrays."""
+    forest_arrays, forest_meta = export_forest(iso_forest)
+    lookups = compile_encoders(label_encoders)
+
+    arrays = {f"forest.{name}": array for name, array in forest_arrays.items()}
+    arrays["scaler.min"] = np.asarray(scaler.min_, dtype=np.float64)
+    arrays["scaler.scale"] = np.asarray(scaler.scale_, dtype=np.float64)
+    for col in CATEGORICAL_COLUMNS:
+        arrays[f"vocab.{col}"] = np.array(lookups[col].classes_, dtype=str)
+    if isinstance(ip_frequencies, IPFrequencySketch):
+        arrays.update(ip_frequencies.to_arrays())
+    else:
+        ip_table = SortedFrequencyTable.from_dict(compile_ip_frequencies(ip_frequencies, label_encoders))
+        arrays["ip.keys"] = ip_table.keys
+        arrays["ip.values"] = ip_table.values
+    if calibration is not None:
+        arrays.update(calibration.to_arrays())
+        meta = dict(meta or {}, calibration=calibration.header_meta())
+    write_bundle_arrays(path, arrays, forest_meta, meta)
+
+def write_bundle_arrays(path, arrays, forest_meta, meta=None):
+    """Write already-packed bundle arrays (the names read_bundle returns)."""
+    arrays = dict(arrays)
+    header = {
+        "version": BUNDLE_VERSION,
+        "feature_columns": FEATURE_COLUMNS,
+        "forest": forest_meta,
+        "meta": meta or {},
+        "arrays": {}
+    }
+    offset = 0
+    for name, array in arrays.items():
+        array = np.ascontiguousarray(array)
+        arrays[name] = array
+        header["arrays"][name] = {"dtype": array.dtype.str, "shape": list(array.shape), "offset": offset}
+        offset += -(-array.nbytes // BUNDLE_ALIGNMENT) * BUNDLE_ALIGNMENT
+
+    header_bytes = json.dumps(header).encode("utf-8")
+    data_start = -(-(len(BUNDLE_MAGIC) + 8 + len(header_bytes)) // BUNDLE_ALIGNMENT) * BUNDLE_ALIGNMENT
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(BUNDLE_MAGIC)
+        f.write(len(header_bytes).to_bytes(8, "little"))
+        f.write(header_bytes)
+        for name, array in arrays.items():
+            f.seek(data_start + header["arrays"][name]["offset"])
+            f.write(array.tobytes())
+        f.truncate(data_start + offset)
+    os.replace(tmp_path, path)
+
+def read_bundle(path):
+    """Map a bundle read-only. Returns (header, arrays); the arrays are views
+    into one shared memory map, so worker processes share their pages."""
+    with open(path, "rb") as f:
+        if f.read(len(BUNDLE_MAGIC)) != BUNDLE_MAGIC:
+            raise BundleError(f"{path} is not a model bundle")
+        header_len = int.from_bytes(f.read(8), "little")
+        header = json.loads(f.read(header_len).decode("utf-8"))
+    data_start = -(-(len(BUNDLE_MAGIC) + 8 + header_len) // BUNDLE_ALIGNMENT) * BUNDLE_ALIGNMENT
+
+    if header.get("version") != BUNDLE_VERSION:
+        raise BundleError(f"Unsupported bundle version {header.get('version')}, expected {BUNDLE_VERSION}")
+
+    mapped = np.memmap(path, dtype=np.uint8, mode="r")
+    arrays = {}
+    for name, spec in header["arrays"].items():
+        dtype = np.dtype(spec["dtype"])
+        count = int(np.prod(spec["shape"], dtype=np.int64))
+        arrays[name] = np.frombuffer(mapped, dtype=dtype, count=count, offset=data_start + spec["offset"]).reshape(spec["shape"])
+    return header, arrays
+
+def load_bundle(path, feature_columns=FEATURE_COLUMNS):
+    header, arrays = read_bundle(path)
+    if header["feature_columns"] != list(feature_columns):
+        raise BundleError(f"Bundle feature order {header['feature_columns']} does not match {list(feature_columns)}")
+
+    forest = FlatForest({name[len("forest."):]: array for name, array in arrays.items() if name.startswith("forest.")}, header["forest"])
+    scaler = MinMaxTransform(arrays["scaler.min"], arrays["scaler.scale"])
+    if "ipsketch.counts" in arrays:
+        ip_table = IPFrequencySketch.from_arrays(arrays)
+    else:
+        ip_table = SortedFrequencyTable(arrays["ip.keys"], arrays["ip.values"])
+    calibration = Calibration.from_bundle(header["meta"], arrays)
+    return ModelArtifacts(forest, scaler, ip_table, dict(header["meta"], version=header["version"], path=path), calibration)
+
+def load_pickles(directory=".", use_flat_forest=False):
+    # joblib (and sklearn through the pickles) are only needed on this path
+    import joblib
+    iso_forest = joblib.load(os.path.join(directory, "isolation_forest_model.pkl"))
+    scaler = joblib.load(os.path.join(directory, "scaler.pkl"))
+    label_encoders = joblib.load(os.path.join(directory, "label_encoders.pkl"))
+    ip_frequencies = joblib.load(os.path.join(directory, "ip_frequencies.pkl"))
+
+    forest = FlatForest.from_sklearn(iso_forest) if use_flat_forest else iso_forest
+    return ModelArtifacts(
+        forest, scaler, compile_ip_frequencies(ip_frequencies, label_encoders), {"path": directory},
+        Calibration.load(os.path.join(directory, "calibration.json"))
+    )
+
+if __name__ == "__main__":
+    import argparse
+    import joblib
+    parser = argparse.ArgumentParser(description="Build a model bundle from the trained pickles.")
+    parser.add_argument("--directory", default=".", help="Directory holding the trained pickles")
+    parser.add_argument("--output", default="model_bundle.ifb")
+    args = parser.parse_args()
+
+    write_bundle(
+        args.output,
+        joblib.load(os.path.join(args.directory, "isolation_forest_model.pkl")),
+        joblib.load(os.path.join(args.directory, "scaler.pkl")),
+        joblib.load(os.path.join(args.directory, "label_encoders.pkl")),
+        joblib.load(os.path.join(args.directory, "ip_frequencies.pkl")),
+        calibration=Calibration.load(os.path.join(args.directory, "calibration.json"))
+    )
+    print(f"✅ Model bundle written to {args.output}")
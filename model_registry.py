@@ -0,0 +1,112 @@
+import os
+import threading
+from datetime import datetime
+import numpy as np
+from model_bundle import FEATURE_COLUMNS
+
+def warm_up(model, rows=8):
+    """Fault in the model's pages and code paths before it takes traffic."""
+    model.risk_scores(np.zeros((rows, len(FEATURE_COLUMNS))))
+    model.ip_frequency_table.get("0.0.0.0", None)
+
+class ModelRegistry:
+    """Holds the live ModelArtifacts behind a single reference.
+
+    Reloads build and warm the new artifacts off the request path, then swap
+    them in with one assignment; requests that already grabbed `current` keep
+    scoring with the old version. The replaced version is kept for rollback.
+    """
+
+    def __init__(self, loader):
+        self._loader = loader
+        self._reload_lock = threading.Lock()
+        self.current = None
+        self.previous = None
+        self.loaded_at = None
+        self.last_error = None
+        self.reloading = False
+        self._watch_stop = None
+
+    def load(self, source=None):
+        model = self._loader(source)
+        warm_up(model)
+        return model
+
+    def _swap(self, model):
+        self.previous, self.current = self.current, model
+        self.loaded_at = datetime.utcnow().isoformat()
+        self.last_error = None
+
+    def reload(self, source=None, background=True):
+        """Load `source` (the loader's default when None) and swap it in.
+        Returns False when a reload is already running and, in the
+        foreground, when the load failed (see last_error)."""
+        if not self._reload_lock.acquire(blocking=False):
+            return False
+        self.reloading = True
+
+        def run():
+            try:
+                self._swap(self.load(source))
+                return True
+            except Exception as e:
+                self.last_error = f"{type(e).__name__}: {e}"
+                return False
+            finally:
+                self.reloading = False
+                self._reload_lock.release()
+
+        if background:
+            threading.Thread(target=run, name="model-reload", daemon=True).start()
+            return True
+        return run()
+
+    def rollback(self):
+        with self._reload_lock:
+            if self.previous is None:
+                return False
+            self.current, self.previous = self.previous, self.current
+            self.loaded_at = datetime.utcnow().isoformat()
+            return True
+
+    def watch(self, path, interval=5.0):
+        """Reload whenever the file at `path` is replaced, e.g. by IF.py,
+        until unwatch()."""
+        def signature():
+            try:
+                stat = os.stat(path)
+                return stat.st_mtime_ns, stat.st_size, stat.st_ino
+            except OSError:
+                return None
+
+        self.unwatch()
+        stop = self._watch_stop = threading.Event()
+
+        def run():
+            seen = signature()
+            while not stop.wait(interval):
+                current = signature()
+                # A failed or skipped reload (a half-written file, an admin
+                # reload running) is retried on the next tick
+                if current is not None and current != seen and self.reload(path, background=False):
+                    seen = current
+
+        thread = threading.Thread(target=run, name="model-watch", daemon=True)
+        thread.start()
+        return thread
+
+    def unwatch(self):
+        if self._watch_stop is not None:
+            self._watch_stop.set()
+            self._watch_stop = None
+
+    def info(self):
+        def describe(model):
+            return dict(model.meta) if model is not None else None
+        return {
+            "current": describe(self.current),
+            "previous": describe(self.previous),
+            "loaded_at": self.loaded_at,
+            "reloading": self.reloading,
+            "last_error": self.last_error
+        }
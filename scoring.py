@@ -0,0 +1,202 @@
+from datetime import datetime
+import numpy as np
+from calibration import Calibration
+from encoding import ip_frequency
+from geo import geo_velocity as geo_velocity_kernel
+from metrics import StageMetrics
+
+# Pure scoring steps shared by the Flask and ASGI services: no DB access, no
+# request context. Previous logins are LastLogin snapshots (or None).
+
+# Block outright above this speed (km/h)
+MAX_GEO_VELOCITY = 1000
+# total_risk_score thresholds once features changed: MFA from, Block from
+CHANGE_MFA_SCORE = 4
+CHANGE_BLOCK_SCORE = 8
+CHANGE_EDGES = np.array([CHANGE_MFA_SCORE, CHANGE_BLOCK_SCORE], dtype=np.float64)
+CHANGE_DECISIONS = np.array(["Allow", "MFA", "Block"])
+
+# The original fixed thresholds, for models trained without a calibration
+DEFAULT_CALIBRATION = Calibration()
+
+_NO_METRICS = StageMetrics(enabled=False)
+
+# Parse a login event from a request payload
+def parse_login(data):
+    return {
+        "userID": data.get("userID"),
+        "IPaddress": data.get("IPaddress"),
+        "Latitude": float(data.get("Latitude", 0.0)),
+        "Longitude": float(data.get("Longitude", 0.0)),
+        "Timezone": data.get("Timezone", "Unknown"),
+        "DeviceInfo": data.get("DeviceInfo", "Unknown"),
+        "TypingSpeed": float(data.get("TypingSpeed", 0.0)),
+        "MouseSpeed": float(data.get("MouseSpeed", 0.0)),
+        "LoginTime": datetime.utcnow()
+    }
+
+# Geo-velocity for a round of logins against their previous logins, in one kernel call
+def calculate_geo_velocities(logins, prev_attempts, mode="exact"):
+    nan = float("nan")
+    return geo_velocity_kernel(
+        [prev.Latitude if prev else nan for prev in prev_attempts],
+        [prev.Longitude if prev else nan for prev in prev_attempts],
+        [login["Latitude"] for login in logins],
+        [login["Longitude"] for login in logins],
+        [(login["LoginTime"] - prev.LoginTime).total_seconds() / 3600.0 if prev else nan
+         for login, prev in zip(logins, prev_attempts)],
+        mode=mode
+    )
+
+# Compare a login against the user's previous accepted login
+def compare_with_previous(login, prev_attempt):
+    changed_features = []
+    error_score = 0
+
+    if prev_attempt:
+        if login["IPaddress"] != prev_attempt.IPaddress:
+            error_score += 2
+            changed_features.append("IP Address")
+        if login["DeviceInfo"] != prev_attempt.DeviceInfo:
+            error_score += 3
+            changed_features.append("Device")
+        if login["Timezone"] != prev_attempt.Timezone:
+            error_score += 3
+            changed_features.append("Timezone")
+        if (login["Latitude"], login["Longitude"]) != (prev_attempt.Latitude, prev_attempt.Longitude):
+            error_score += 5
+            changed_features.append("Location")
+
+    return error_score, changed_features
+
+def decide_risk(risk_score, error_score, changed_features, calibration=DEFAULT_CALIBRATION):
+    # Always calculate total risk score
+    total_risk_score = error_score - risk_score
+
+    if not changed_features:
+        # No changes → Use the model's calibrated thresholds
+        if risk_score < calibration.allow_threshold:
+            risk_decision = "Allow"
+        elif calibration.allow_threshold <= risk_score <= calibration.mfa_threshold:
+            risk_decision = "MFA"
+        else:
+            risk_decision = "Block"
+    else:
+        # Changes detected → Use total risk score
+        if total_risk_score >= CHANGE_BLOCK_SCORE:
+            risk_decision = "Block"
+        elif total_risk_score >= CHANGE_MFA_SCORE:
+            risk_decision = "MFA"
+        else:
+            risk_decision = "Allow"
+
+    return total_risk_score, risk_decision
+
+# Vectorized decide_risk over arrays of scores; has_changes[i] is bool(changed_features)
+def decide_risks(risk_scores, error_scores, has_changes, calibration=DEFAULT_CALIBRATION):
+    total_risk_scores = error_scores - risk_scores
+    model_decisions = calibration.decisions(risk_scores)
+    change_decisions = CHANGE_DECISIONS[np.searchsorted(CHANGE_EDGES, total_risk_scores, side="right")]
+    return total_risk_scores, np.where(has_changes, change_decisions, model_decisions)
+
+# Split logins into rounds holding at most one login per user, so a user's
+# later logins are compared against the ones allowed earlier in the batch
+def split_rounds(logins):
+    rounds = []
+    seen = {}
+    for i, login in enumerate(logins):
+        k = seen.get(login["userID"], 0)
+        seen[login["userID"]] = k + 1
+        if k == len(rounds):
+            rounds.append([])
+        rounds[k].append(i)
+    return rounds
+
+def feature_matrix(logins, geo_velocities, ip_frequency_table):
+    """Raw model features in FEATURE_COLUMNS order."""
+    return np.column_stack([
+        [login["Latitude"] for login in logins],
+        [login["Longitude"] for login in logins],
+        [login["TypingSpeed"] for login in logins],
+        [login["MouseSpeed"] for login in logins],
+        geo_velocities,
+        [login["LoginTime"].hour for login in logins],
+        [ip_frequency(ip_frequency_table, login["IPaddress"]) for login in logins]
+    ]).astype(np.float64)
+
+def score_round(logins, prev_attempts, model, geo_mode="exact", stage_metrics=None):
+    """Score logins of distinct users against their previous logins with one
+    model call. Returns one result dict per login, in order."""
+    stage_metrics = stage_metrics or _NO_METRICS
+    results = [None] * len(logins)
+
+    with stage_metrics.time("geo_velocity"):
+        geo_velocities = calculate_geo_velocities(logins, prev_attempts, geo_mode)
+
+    scored = []
+    with stage_metrics.time("feature_change"):
+        for i, (login, prev_attempt, geo_velocity) in enumerate(zip(logins, prev_attempts, geo_velocities)):
+            error_score, changed_features = compare_with_previous(login, prev_attempt)
+            geo_velocity = float(geo_velocity)
+
+            # Block if geo-velocity exceeds 1000 km/h
+            if geo_velocity > MAX_GEO_VELOCITY:
+                results[i] = {
+                    "isolation_forest_risk_score": "N/A",
+                    "feature_change_risk_score": error_score,
+                    "changed_features": changed_features,
+                    "total_risk_score": "Blocked due to extreme geo-velocity",
+                    "geo_velocity": geo_velocity,
+                    "risk_decision": "Block"
+                }
+                continue
+            scored.append((i, error_score, changed_features, geo_velocity))
+
+    if not scored:
+        return results
+
+    with stage_metrics.time("encoding"):
+        features = feature_matrix([logins[i] for i, _, _, _ in scored], [v for _, _, _, v in scored], model.ip_frequency_table)
+    with stage_metrics.time("scaler"):
+        features = model.scaler.transform(features)
+    with stage_metrics.time("decision_function"):
+        risk_scores = -model.forest.decision_function(features)
+
+    with stage_metrics.time("decision"):
+        calibration = getattr(model, "calibration", DEFAULT_CALIBRATION)
+        total_risk_scores, risk_decisions = decide_risks(
+            risk_scores,
+            np.array([error_score for _, error_score, _, _ in scored], dtype=np.float64),
+            np.array([bool(changed_features) for _, _, changed_features, _ in scored]),
+            calibration
+        )
+        percentile_ranks = calibration.percentile_ranks(risk_scores)
+
+    for k, (i, error_score, changed_features, geo_velocity) in enumerate(scored):
+        risk_score = float(risk_scores[k])
+        results[i] = {
+            "isolation_forest_risk_score": risk_score,
+            "feature_change_risk_score": error_score,
+            "changed_features": changed_features,
+            "total_risk_score": float(total_risk_scores[k]),
+            "geo_velocity": geo_velocity,
+            "risk_decision": str(risk_decisions[k]),
+            "risk_score": risk_score,
+            "risk_percentile": float(percentile_ranks[k]) if percentile_ranks is not None else None
+        }
+    return results
+
+def score_items(items, geo_mode="exact", stage_metrics=None):
+    """Score (login, previous login, model) items, each with the model its
+    caller captured, so a reload never splits a caller's logins between two
+    models. One score_round per model, normally one. Returns one result dict
+    per item, in order."""
+    groups = {}
+    for i, (_, _, model) in enumerate(items):
+        groups.setdefault(id(model), (model, []))[1].append(i)
+    results = [None] * len(items)
+    for model, indices in groups.values():
+        scored = score_round([items[i][0] for i in indices], [items[i][1] for i in indices], model, geo_mode, stage_metrics)
+        for i, result in zip(indices, scored):
+            results[i] = result
+    return results
@@ -0,0 +1,195 @@
+"""Prefork production server for app.py.
+
+The parent imports app.py once, which maps and warms the model bundle
+(or unpickles the forest), loads the encoders, IP table and user profiles.
+It then runs a full collection and gc.freeze(): everything built so far
+moves to the permanent generation, so the workers' garbage collections
+never write to those objects' pages. Workers forked afterwards share all of
+it copy-on-write; only pages a worker writes (its caches, the profiles and
+IP-sketch counters it updates) are copied.
+
+The parent binds the listening socket and forks the workers, one per
+available core by default; with --pin each is pinned to its own core. The
+workers accept from the shared socket. The parent restarts a worker that
+dies. On SIGTERM or SIGINT each worker stops accepting, finishes its
+in-flight requests and flushes queued writes, and then the parent exits.
+
+Workers share no per-user state, and a user's next login may land on any
+of them. So that it still compares against the login before it, app.py
+runs with WORKER_PROCESSES set to the worker count. With more than one
+worker, it then keeps no last-login cache, writes accepted logins
+synchronously instead of through the write-behind queue, and re-reads each
+user's login history from the database on every request. Two concurrent
+logins of one user on different workers can still miss each other, as they
+can with the threads of a single process.
+
+That correctness costs throughput. Every login pays the database reads
+and a synchronous commit that a single worker serves from memory or
+queues. On one core, benchmarks/bench_serve.py measured 446 req/s with one
+worker and 306 req/s with two. More workers only pay off with spare cores
+and a database that keeps up with the extra reads; measure on the target
+machine before adding them. Offline scoring scales differently:
+bulk_score.py and stream_consumer.py partition users across their workers,
+so each worker keeps its caches.
+
+Two kinds of state still stay per worker. User profiles diverge between
+workers, and with more than one worker the profile file is not written
+(the workers would overwrite each other); rebuild it from login_attempts
+with user_profiles.py --database-url. IP-sketch updates (IP_SKETCH_UPDATES)
+are also per worker; refresh.py merges new logins for all of them.
+
+Run: python serve.py --host 0.0.0.0 --port 5000 --workers 4 --pin
+"""
+import argparse
+import gc
+import os
+import signal
+import socket
+import threading
+import time
+import traceback
+from werkzeug.serving import WSGIRequestHandler, make_server
+
+def available_cores():
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5000)
+    parser.add_argument("--workers", type=int, default=len(available_cores()), help="Worker processes (default: available cores)")
+    parser.add_argument("--pin", action="store_true", help="Pin each worker to one core")
+    parser.add_argument("--no-threads", action="store_true", help="Handle one request at a time per worker")
+    parser.add_argument("--backlog", type=int, default=1024)
+    parser.add_argument("--graceful-timeout", type=int, default=30,
+                        help="Seconds workers get to finish in-flight requests on shutdown before being killed")
+    parser.add_argument("--access-log", action="store_true", help="Log every request to stderr")
+    return parser.parse_args(argv)
+
+class QuietRequestHandler(WSGIRequestHandler):
+    def log_request(self, *args, **kwargs):
+        pass
+
+class InFlight:
+    """WSGI middleware counting the requests being handled, so a stopping
+    worker can wait for them."""
+
+    def __init__(self, app):
+        self.app = app
+        self.count = 0
+        self._cond = threading.Condition()
+
+    def __call__(self, environ, start_response):
+        with self._cond:
+            self.count += 1
+        try:
+            return self.app(environ, start_response)
+        finally:
+            with self._cond:
+                self.count -= 1
+                self._cond.notify_all()
+
+    def wait(self, timeout):
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while self.count:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+def preload(workers):
+    """Import the service with everything it loads at startup, and freeze
+    the result for the workers to share."""
+    os.environ["DEFER_BACKGROUND_START"] = "1"
+    os.environ["WORKER_PROCESSES"] = str(workers)
+    # No collections while loading: they would only touch pages to be shared
+    gc.disable()
+    import app as service
+    with service.app.app_context():
+        service.db.create_all()
+        service.db.engine.dispose()
+    gc.collect()
+    gc.freeze()
+    return service
+
+def run_worker(service, listener, args, core):
+    if core is not None:
+        os.sched_setaffinity(0, {core})
+    gc.enable()
+    # The parent owns Ctrl-C; workers stop on the SIGTERM it forwards
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    service.start_background_workers()
+    if args.workers == 1:
+        service.start_profile_persistence()
+
+    app = InFlight(service.app)
+    handler = WSGIRequestHandler if args.access_log else QuietRequestHandler
+    server = make_server(args.host, args.port, app, threaded=not args.no_threads,
+                         request_handler=handler, fd=listener.fileno())
+    # shutdown() waits for serve_forever() to return, so it cannot run in
+    # the signal handler, which interrupts serve_forever() itself
+    signal.signal(signal.SIGTERM, lambda *_: threading.Thread(target=server.shutdown, daemon=True).start())
+    server.serve_forever()
+    app.wait(args.graceful_timeout)
+    service.stop_background_workers()
+
+def main(argv=None):
+    args = parse_args(argv)
+    listener = socket.create_server((args.host, args.port), backlog=args.backlog)
+    service = preload(args.workers)
+    cores = available_cores()
+    workers = {}
+
+    def spawn(slot):
+        pid = os.fork()
+        if pid == 0:
+            try:
+                run_worker(service, listener, args, cores[slot % len(cores)] if args.pin else None)
+            except BaseException:
+                traceback.print_exc()
+                os._exit(1)
+            # A normal interpreter exit, so the atexit hooks (profile save) run
+            raise SystemExit(0)
+        workers[pid] = slot
+
+    for slot in range(args.workers):
+        spawn(slot)
+    print(f"✅ Serving on http://{args.host}:{args.port} with {args.workers} workers "
+          f"({', '.join(str(pid) for pid in workers)}){' pinned to cores' if args.pin else ''}", flush=True)
+
+    stopping = []
+
+    def stop(signum, frame):
+        if not stopping:
+            stopping.append(signum)
+            for pid in workers:
+                os.kill(pid, signal.SIGTERM)
+            signal.alarm(args.graceful_timeout + 5)
+
+    def kill_stragglers(signum, frame):
+        for pid in workers:
+            os.kill(pid, signal.SIGKILL)
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGALRM, kill_stragglers)
+
+    while workers:
+        pid, status = os.wait()
+        slot = workers.pop(pid, None)
+        if slot is None or stopping:
+            continue
+        print(f"ℹ️ Worker {pid} exited with status {os.waitstatus_to_exitcode(status)}; restarting it", flush=True)
+        # Back off a little, in case it dies on startup
+        time.sleep(1.0)
+        if not stopping:
+            spawn(slot)
+    listener.close()
+    print("✅ All workers stopped.", flush=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,389 @@
+"""Streaming consumer that scores login events from a log or queue.
+
+Events are JSON objects in the /predict schema. They are read from a
+source in micro-batches and scored with app.score_logins, the same feature
+and decision path as /predict (previous-login lookup, history and profile
+features, one model call per round, allowed logins recorded). One decision
+record per event goes to a sink, and the source offset is checkpointed
+after each batch.
+
+Sources: a JSONL file, optionally tailed as it grows (offsets are byte
+positions), and an in-process queue for tests and embedding (offsets count
+events taken). Sinks: a JSONL file and an in-process queue.
+
+Delivery is at-least-once: a batch's records are flushed to the sink, and
+its write-behind inserts committed, before its checkpoint is written. A
+crash in between replays the batch on restart.
+
+Workers are partitioned by crc32(userID) % workers. Each worker reads the
+whole source and scores only its own users, so a user's cache, history and
+profile state live in exactly one process. Each worker has its own
+checkpoint and, with more than one worker, its own profile file.
+
+Run: python stream_consumer.py events.jsonl --follow --workers 4 --output decisions-{partition}.jsonl
+"""
+import argparse
+import json
+import multiprocessing as mp
+import os
+import shutil
+import signal
+import time
+import zlib
+from datetime import datetime
+from queue import Empty
+from stream_train import LOGIN_TIME_FORMAT
+from user_profiles import default_profiles_path
+
+def partition_of(userID, partitions):
+    return zlib.crc32(str(userID).encode("utf-8")) % partitions
+
+def parse_event_time(value):
+    """LoginTime as logged (LOGIN_TIME_FORMAT) or ISO 8601."""
+    try:
+        return datetime.strptime(value, LOGIN_TIME_FORMAT)
+    except ValueError:
+        return datetime.fromisoformat(value)
+
+class JsonlSource:
+    """One JSON event per line of a file. With `follow` the file is tailed:
+    a last line without its newline is left until the writer finishes it."""
+
+    def __init__(self, path, follow=False, poll_interval=0.05):
+        self.path = path
+        self.follow = follow
+        self.poll_interval = poll_interval
+        self._file = None
+
+    def read(self, offset, max_events, timeout):
+        """Up to `max_events` (offset, next_offset, line) from `offset`,
+        waiting up to `timeout` seconds for the first one. A missing file is
+        an error unless following, which waits for it to appear."""
+        deadline = time.monotonic() + timeout
+        if self._file is None:
+            if not os.path.exists(self.path):
+                if not self.follow:
+                    raise FileNotFoundError(f"Error: Input file {self.path} not found!")
+                time.sleep(self.poll_interval)
+                return []
+            self._file = open(self.path, "rb")
+        self._file.seek(offset)
+        items = []
+        while len(items) < max_events:
+            line = self._file.readline()
+            if not line or (self.follow and not line.endswith(b"\n")):
+                self._file.seek(offset)
+                if items or not self.follow or time.monotonic() >= deadline:
+                    break
+                time.sleep(self.poll_interval)
+                continue
+            items.append((offset, offset + len(line), line))
+            offset += len(line)
+        return items
+
+    def at_end(self, offset):
+        return not self.follow and os.path.exists(self.path) and offset >= os.path.getsize(self.path)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+class QueueSource:
+    """Events (dicts or JSON strings) put on a queue.Queue; None marks the
+    end of the stream. Offsets count the events taken, so a checkpoint is
+    only meaningful within the process that owns the queue."""
+
+    def __init__(self, queue):
+        self.queue = queue
+        self.closed = False
+
+    def read(self, offset, max_events, timeout):
+        items = []
+        while len(items) < max_events and not self.closed:
+            try:
+                event = self.queue.get(timeout=timeout) if not items else self.queue.get_nowait()
+            except Empty:
+                break
+            if event is None:
+                self.closed = True
+                break
+            items.append((offset, offset + 1, event))
+            offset += 1
+        return items
+
+    def at_end(self, offset):
+        return self.closed
+
+    def close(self):
+        pass
+
+class JsonlSink:
+    """Appends one JSON decision record per line."""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "a", encoding="utf-8")
+
+    def write(self, records):
+        self._file.writelines(json.dumps(record, default=str) + "\n" for record in records)
+
+    def flush(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        self._file.close()
+
+class QueueSink:
+    """Puts each decision record on a queue.Queue."""
+
+    def __init__(self, queue):
+        self.queue = queue
+
+    def write(self, records):
+        for record in records:
+            self.queue.put(record)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+def app_scorer():
+    """(score_fn, flush_fn) running app.score_logins. flush_fn waits for the
+    write-behind queue, so a checkpoint never gets ahead of the database."""
+    import app as service
+    # The consumer serves logins, so it keeps its profiles like the server
+    service.start_profile_persistence()
+
+    def score(logins):
+        with service.app.app_context():
+            return service.score_logins(logins)
+
+    def flush():
+        if service.write_queue is not None and not service.write_queue.drain():
+            raise RuntimeError("write-behind queue did not drain before the checkpoint")
+
+    return score, flush
+
+class StreamConsumer:
+    """Reads one partition of a source in micro-batches, scores it with
+    `score_fn(logins)` (one result dict per login, in order) and writes the
+    decisions to `sink`, checkpointing the source offset after each batch.
+
+    A batch closes at `batch_size` events read or `max_wait` seconds after
+    its first event, whichever comes first.
+    """
+
+    def __init__(self, source, sink, score_fn, flush_fn=None, checkpoint_path=None, partition=0, partitions=1,
+                 batch_size=256, max_wait=0.05, event_time=False, poll_timeout=1.0):
+        self.source = source
+        self.sink = sink
+        self.score_fn = score_fn
+        self.flush_fn = flush_fn
+        self.checkpoint_path = checkpoint_path
+        self.partition = partition
+        self.partitions = partitions
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self.event_time = event_time
+        self.poll_timeout = poll_timeout
+
+        self.offset = 0
+        self.counts = {"batches": 0, "events": 0, "scored": 0, "errors": 0, "other_partitions": 0}
+        self._stopping = False
+
+    def load_checkpoint(self):
+        if self.checkpoint_path and os.path.exists(self.checkpoint_path):
+            with open(self.checkpoint_path, encoding="utf-8") as f:
+                state = json.load(f)
+            if (state["partition"], state["partitions"]) != (self.partition, self.partitions):
+                raise ValueError(f"Error: {self.checkpoint_path} was written by partition {state['partition']} of {state['partitions']}!")
+            self.offset = state["offset"]
+        return self.offset
+
+    def checkpoint(self):
+        if not self.checkpoint_path:
+            return
+        state = {"offset": self.offset, "partition": self.partition, "partitions": self.partitions,
+                 "updated": datetime.utcnow().isoformat()}
+        tmp_path = f"{self.checkpoint_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def stop(self):
+        """Finish the current batch, checkpoint and return from run()."""
+        self._stopping = True
+
+    def parse(self, event):
+        from scoring import parse_login
+        login = parse_login(event)
+        if self.event_time and event.get("LoginTime"):
+            login["LoginTime"] = parse_event_time(event["LoginTime"])
+        return login
+
+    def next_batch(self):
+        items = []
+        offset = self.offset
+        deadline = None
+        while len(items) < self.batch_size and not self._stopping:
+            timeout = self.poll_timeout if deadline is None else deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            got = self.source.read(offset, self.batch_size - len(items), timeout)
+            if not got:
+                if deadline is not None or self.source.at_end(offset):
+                    break
+                continue
+            items.extend(got)
+            offset = got[-1][1]
+            if deadline is None:
+                deadline = time.monotonic() + self.max_wait
+        return items
+
+    def process(self, items):
+        """Decision records for this partition's events among `items`."""
+        records = []
+        logins = []
+        positions = []
+        for offset, _, raw in items:
+            if isinstance(raw, (bytes, str)):
+                if not raw.strip():
+                    continue
+                try:
+                    event = json.loads(raw)
+                except ValueError as e:
+                    # Unreadable events have no user; partition 0 reports them
+                    if self.partition == 0:
+                        records.append({"offset": offset, "error": f"Malformed event: {e}"})
+                    continue
+            else:
+                event = raw
+            if not isinstance(event, dict):
+                if self.partition == 0:
+                    records.append({"offset": offset, "error": "Event is not a JSON object"})
+                continue
+            if partition_of(event.get("userID"), self.partitions) != self.partition:
+                self.counts["other_partitions"] += 1
+                continue
+            record = {"offset": offset, "userID": event.get("userID")}
+            try:
+                logins.append(self.parse(event))
+                positions.append(len(records))
+            except (TypeError, ValueError) as e:
+                record["error"] = str(e)
+            records.append(record)
+
+        if logins:
+            for position, result in zip(positions, self.score_fn(logins)):
+                records[position].update(result)
+        self.counts["scored"] += len(logins)
+        self.counts["errors"] += sum("error" in record for record in records)
+        return records
+
+    def run(self):
+        """Consume until the source ends (a finite file or a closed queue) or
+        stop() is called. Returns the counts."""
+        self.load_checkpoint()
+        while not self._stopping:
+            items = self.next_batch()
+            if not items:
+                if self._stopping or self.source.at_end(self.offset):
+                    break
+                continue
+            records = self.process(items)
+            self.sink.write(records)
+            self.sink.flush()
+            if self.flush_fn is not None:
+                self.flush_fn()
+            self.offset = items[-1][1]
+            self.checkpoint()
+            self.counts["batches"] += 1
+            self.counts["events"] += len(items)
+        return dict(self.counts, offset=self.offset)
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("input", help="JSONL file of login events")
+    parser.add_argument("--follow", action="store_true", help="Keep tailing the file as it grows")
+    parser.add_argument("--output", default="decisions-{partition}.jsonl",
+                        help="Decision JSONL per worker; {partition} is replaced by the worker number")
+    parser.add_argument("--checkpoint-dir", default="stream_checkpoints")
+    parser.add_argument("--workers", type=int, default=1, help="Worker processes, partitioned by userID")
+    parser.add_argument("--batch-size", type=int, default=256, help="Events read per micro-batch")
+    parser.add_argument("--max-wait", type=float, default=0.05, help="Seconds a batch waits to fill")
+    parser.add_argument("--poll-interval", type=float, default=0.05, help="Seconds between reads at the end of a followed file")
+    parser.add_argument("--event-time", action="store_true",
+                        help="Score with each event's LoginTime instead of the time it is consumed (for replays)")
+    return parser.parse_args(argv)
+
+def run_partition(args, partition):
+    partitions = args.workers
+    if partitions > 1:
+        # Each worker keeps its own copy of the profiles, seeded from the
+        # shared file; it only ever updates its own users
+        base = os.environ.get("USER_PROFILES_PATH", default_profiles_path())
+        path = os.path.join(args.checkpoint_dir, f"user_profiles-{partition}-of-{partitions}.npz")
+        if base and os.path.exists(base) and not os.path.exists(path):
+            shutil.copyfile(base, path)
+        os.environ["USER_PROFILES_PATH"] = path
+
+    score_fn, flush_fn = app_scorer()
+    source = JsonlSource(args.input, follow=args.follow, poll_interval=args.poll_interval)
+    sink = JsonlSink(args.output.format(partition=partition))
+    consumer = StreamConsumer(
+        source, sink, score_fn, flush_fn,
+        checkpoint_path=os.path.join(args.checkpoint_dir, f"partition-{partition}-of-{partitions}.json"),
+        partition=partition, partitions=partitions,
+        batch_size=args.batch_size, max_wait=args.max_wait, event_time=args.event_time
+    )
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(signum, lambda *_: consumer.stop())
+
+    start = time.perf_counter()
+    try:
+        counts = consumer.run()
+    finally:
+        source.close()
+        sink.close()
+    elapsed = time.perf_counter() - start
+    print(f"✅ Partition {partition}/{partitions}: {counts['scored']} events scored, {counts['errors']} errors, "
+          f"{counts['batches']} batches, offset {counts['offset']} ({counts['scored'] / max(elapsed, 1e-9):.0f} events/s)")
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.workers > 1 and "{partition}" not in args.output:
+        raise ValueError("Error: --output needs a {partition} placeholder with more than one worker!")
+    if not args.follow and not os.path.exists(args.input):
+        raise FileNotFoundError(f"Error: Input file {args.input} not found!")
+    os.makedirs(args.checkpoint_dir, exist_ok=True)
+
+    if args.workers == 1:
+        run_partition(args, 0)
+        return
+
+    ctx = mp.get_context("spawn")
+    workers = [ctx.Process(target=run_partition, args=(args, k), name=f"stream-{k}") for k in range(args.workers)]
+    for worker in workers:
+        worker.start()
+    try:
+        for worker in workers:
+            worker.join()
+    except KeyboardInterrupt:
+        for worker in workers:
+            if worker.is_alive():
+                worker.terminate()
+        for worker in workers:
+            worker.join()
+    failed = [worker.name for worker in workers if worker.exitcode != 0]
+    if failed:
+        raise SystemExit(f"Error: workers {', '.join(failed)} failed!")
+    print(f"ℹ️ {args.workers} workers finished; checkpoints in {args.checkpoint_dir}")
+
+if __name__ == "__main__":
+    main()
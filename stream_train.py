@@ -0,0 +1,191 @@
+from collections import Counter
+import numpy as np
+import pandas as pd
+import joblib
+from datetime import datetime
+from sklearn.preprocessing import MinMaxScaler
+from sklearn.ensemble import IsolationForest
+from sklearn.model_selection import train_test_split
+from calibration import Calibration
+from geo import geo_velocity
+from encoding import CategoryLookup, ip_frequency_many
+from ip_sketch import IPFrequencySketch
+from model_bundle import FEATURE_COLUMNS, write_bundle
+
+LOGIN_TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+INPUT_COLUMNS = ["userID", "IPaddress", "Timezone", "Latitude", "Longitude", "DeviceInfo", "TypingSpeed", "MouseSpeed", "LoginTime"]
+
+def ip_sketch_params(args):
+    """IPFrequencySketch arguments for the training flags, None for the exact table."""
+    if args.ip_frequencies == "exact":
+        return None
+    return {"width": args.ip_sketch_width, "depth": args.ip_sketch_depth, "half_life": args.ip_half_life_days * 86400.0}
+
+def fit_and_calibrate(X, args):
+    """Fit the forest on the scaled rows and calibrate its decision thresholds
+    on their risk scores. With a validation fraction the forest is fitted on
+    a training split only and calibrated on the held-out rest."""
+    if args.validation_fraction > 0:
+        X_train, X_valid = train_test_split(X, test_size=args.validation_fraction, random_state=args.seed)
+    else:
+        X_train = X_valid = X
+    iso_forest = IsolationForest(n_estimators=100, contamination=0.14, random_state=args.seed)
+    iso_forest.fit(X_train)
+    calibration = Calibration.fit(-iso_forest.decision_function(X_train), -iso_forest.decision_function(X_valid),
+                                  args.allow_percentile, args.mfa_percentile)
+    print(f"✅ Decision thresholds calibrated on {len(X_valid)} validation rows: "
+          f"Allow below {calibration.allow_threshold:.4f}, MFA up to {calibration.mfa_threshold:.4f}")
+    return iso_forest, calibration
+
+class Reservoir:
+    """Uniform fixed-size sample of feature rows (Algorithm R), updated a
+    chunk at a time."""
+
+    def __init__(self, capacity, n_features, seed=42):
+        self.capacity = capacity
+        self.data = np.empty((capacity, n_features))
+        self.size = 0
+        self.seen = 0
+        self._rng = np.random.default_rng(seed)
+
+    def update(self, rows):
+        fill = min(self.capacity - self.size, len(rows))
+        if fill > 0:
+            self.data[self.size:self.size + fill] = rows[:fill]
+            self.size += fill
+        rest = rows[max(fill, 0):]
+        if len(rest):
+            # Row i of the stream replaces a random slot with probability capacity / (i + 1)
+            positions = self.seen + max(fill, 0) + np.arange(len(rest))
+            slots = self._rng.integers(0, positions + 1)
+            keep = slots < self.capacity
+            self.data[slots[keep]] = rest[keep]
+        self.seen += len(rows)
+
+    def sample(self):
+        return self.data[:self.size]
+
+def read_chunks(path, chunksize):
+    return pd.read_csv(path, usecols=INPUT_COLUMNS, dtype={"userID": str, "IPaddress": str, "Timezone": str, "DeviceInfo": str},
+                       chunksize=chunksize)
+
+def count_categories(path, chunksize, ip_sketch=None):
+    """First pass: IP counts (into `ip_sketch` when given, instead of a
+    Counter) and categorical vocabularies."""
+    ip_counts = Counter() if ip_sketch is None else ip_sketch
+    vocabularies = {"Timezone": set(), "DeviceInfo": set()}
+    total = 0
+    for chunk in read_chunks(path, chunksize):
+        if ip_sketch is None:
+            ip_counts.update(chunk["IPaddress"].value_counts().to_dict())
+        else:
+            login_time = pd.to_datetime(chunk["LoginTime"], format=LOGIN_TIME_FORMAT, errors="coerce")
+            timed = login_time.notna()
+            ip_sketch.update_many(chunk.loc[timed, "IPaddress"].astype(str).to_numpy(),
+                                  (login_time[timed] - pd.Timestamp(0)).dt.total_seconds().to_numpy())
+        for col, values in vocabularies.items():
+            values.update(chunk[col].dropna().unique())
+        total += len(chunk)
+    return ip_counts, vocabularies, total
+
+class PreviousLoginState:
+    """Each user's last login (lat, lon, time), carried across chunks."""
+
+    def __init__(self):
+        self.last = {}
+        self.out_of_order = 0
+
+    def add_previous_columns(self, chunk):
+        """Sort the chunk per user by time and attach prev_latitude /
+        prev_longitude / prev_login_time, using the carried state for each
+        user's first row in the chunk. Assumes the input is in chronological
+        order per user across chunks, as login logs are."""
+        chunk = chunk.sort_values(by=["userID", "LoginTime"], kind="mergesort")
+        grouped = chunk.groupby("userID", sort=False)
+        chunk["prev_latitude"] = grouped["Latitude"].shift(1)
+        chunk["prev_longitude"] = grouped["Longitude"].shift(1)
+        chunk["prev_login_time"] = grouped["LoginTime"].shift(1)
+
+        first = ~chunk["userID"].duplicated()
+        carried = [self.last.get(user) for user in chunk.loc[first, "userID"]]
+        chunk.loc[first, "prev_latitude"] = [c[0] if c else np.nan for c in carried]
+        chunk.loc[first, "prev_longitude"] = [c[1] if c else np.nan for c in carried]
+        chunk.loc[first, "prev_login_time"] = pd.to_datetime([c[2] if c else pd.NaT for c in carried])
+        self.out_of_order += int((chunk["prev_login_time"] > chunk["LoginTime"]).sum())
+
+        last = chunk[~chunk["userID"].duplicated(keep="last")]
+        self.last.update(zip(last["userID"], zip(last["Latitude"], last["Longitude"], last["LoginTime"])))
+        return chunk
+
+def chunk_features(chunk, state, ip_frequencies, geo_mode):
+    chunk = chunk.copy()
+    chunk["LoginTime"] = pd.to_datetime(chunk["LoginTime"], format=LOGIN_TIME_FORMAT, errors="coerce")
+    chunk = chunk.dropna(subset=["userID", "LoginTime"])
+    chunk = state.add_previous_columns(chunk)
+    chunk = chunk.dropna()
+    if chunk.empty:
+        return np.empty((0, len(FEATURE_COLUMNS)))
+
+    time_diff = (chunk["LoginTime"] - chunk["prev_login_time"]).dt.total_seconds().to_numpy() / 3600.0
+    chunk["geo_velocity"] = geo_velocity(
+        chunk["prev_latitude"].to_numpy(dtype=float), chunk["prev_longitude"].to_numpy(dtype=float),
+        chunk["Latitude"].to_numpy(), chunk["Longitude"].to_numpy(), time_diff, mode=geo_mode
+    )
+    chunk["login_hour"] = chunk["LoginTime"].dt.hour
+    chunk["ip_frequency"] = ip_frequency_many(ip_frequencies, chunk["IPaddress"].astype(str).to_numpy())
+    return chunk[FEATURE_COLUMNS].to_numpy(dtype=np.float64)
+
+def train_streaming(args, output_path):
+    """Train on a CSV of any size with memory bounded by the chunk size, the
+    reservoir and the per-user state (and the per-IP table with
+    --ip-frequencies exact)."""
+    params = ip_sketch_params(args)
+    ip_counts, vocabularies, total = count_categories(args.input, args.chunksize,
+                                                      IPFrequencySketch(**params) if params is not None else None)
+    if total == 0:
+        raise ValueError("Error: The dataset is empty! Check data loading.")
+    print(f"✅ Dataset scanned. Rows: {total}")
+
+    label_encoders = {}
+    if isinstance(ip_counts, IPFrequencySketch):
+        ip_frequencies = ip_counts
+    else:
+        ip_frequencies = {ip: count / total for ip, count in ip_counts.items()}
+        label_encoders["IPaddress"] = CategoryLookup(sorted(ip_counts)).to_label_encoder()
+    joblib.dump(ip_frequencies, output_path("ip_frequencies.pkl"))
+
+    for col, values in vocabularies.items():
+        label_encoders[col] = CategoryLookup(sorted(values)).to_label_encoder()
+    joblib.dump(label_encoders, output_path("label_encoders.pkl"))
+    print("✅ Label encoders saved.")
+
+    scaler = MinMaxScaler()
+    reservoir = Reservoir(args.reservoir_size, len(FEATURE_COLUMNS), seed=args.seed)
+    state = PreviousLoginState()
+    for chunk in read_chunks(args.input, args.chunksize):
+        features = chunk_features(chunk, state, ip_frequencies, args.geo_mode)
+        if len(features):
+            scaler.partial_fit(features)
+            reservoir.update(features)
+    if reservoir.size == 0:
+        raise ValueError("Error: No training data available after preprocessing!")
+    joblib.dump(scaler, output_path("scaler.pkl"))
+    print(f"✅ Features streamed ({reservoir.seen} rows, {reservoir.size} sampled). Scaler saved.")
+    if state.out_of_order:
+        print(f"ℹ️ {state.out_of_order} logins arrived after a later login of the same user in an earlier chunk; "
+              "sort the input by LoginTime for exact previous-login features.")
+
+    iso_forest, calibration = fit_and_calibrate(scaler.transform(reservoir.sample()), args)
+    calibration.save(output_path("calibration.json"))
+    joblib.dump(iso_forest, output_path("isolation_forest_model.pkl"))
+    print("✅ Isolation Forest training complete. Model saved successfully!")
+
+    if args.bundle:
+        write_bundle(output_path(args.bundle), iso_forest, scaler, label_encoders, ip_frequencies, meta={
+            "trained_at": datetime.utcnow().isoformat(),
+            "input": args.input,
+            "geo_mode": args.geo_mode,
+            "streaming": {"rows": reservoir.seen, "sampled": reservoir.size}
+        }, calibration=calibration)
+        print(f"✅ Model bundle written to {output_path(args.bundle)}")
+    return iso_forest
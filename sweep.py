@@ -0,0 +1,152 @@
+"""Hyperparameter sweep for the Isolation Forest.
+
+Fits a grid of contamination / n_estimators / max_samples configurations in a
+process pool. The scaled feature matrix is built once and shared with the
+workers through shared memory. Prints a leaderboard of fit time, scoring
+latency and detection quality.
+
+Quality is measured against the anomalies that variationanomalous.py appends:
+the last row of each user at the end of its output CSV. Latency is measured
+while other workers are busy; use --workers 1 for uncontended numbers.
+
+Example: python sweep.py --contamination 0.05,0.1,0.14 --n-estimators 100,200 --workers 4
+"""
+import argparse
+import itertools
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import MinMaxScaler
+from sklearn.ensemble import IsolationForest
+from sklearn.metrics import average_precision_score, precision_recall_fscore_support, roc_auc_score
+from forest_engine import FlatForest
+from geo import GEO_VELOCITY_MODES
+from feature_store import FEATURE_CACHE_DIR, load_features
+from stream_train import LOGIN_TIME_FORMAT
+
+def parse_list(cast):
+    def parse(value):
+        return [cast(v) for v in value.split(",") if v]
+    return parse
+
+def max_samples_value(value):
+    return value if value == "auto" else (float(value) if "." in value else int(value))
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--input", default="useractivityvariation5.csv", help="Training CSV (variationanomalous.py output)")
+    parser.add_argument("--geo-mode", choices=GEO_VELOCITY_MODES, default="fast")
+    parser.add_argument("--contamination", type=parse_list(float), default=[0.05, 0.1, 0.14, 0.2])
+    parser.add_argument("--n-estimators", type=parse_list(int), default=[50, 100, 200])
+    parser.add_argument("--max-samples", type=parse_list(max_samples_value), default=[128, "auto", 512])
+    parser.add_argument("--anomalous-rows", type=int,
+                        help="Number of labelled anomalies at the end of the CSV (default: one per user)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Configurations fitted in parallel")
+    parser.add_argument("--n-jobs", type=int, default=1, help="IsolationForest n_jobs inside each worker")
+    parser.add_argument("--latency-rows", type=int, default=200, help="Single-row scoring calls timed per configuration")
+    parser.add_argument("--feature-cache", default=FEATURE_CACHE_DIR, help="Directory of cached engineered features")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--top", type=int, default=20, help="Leaderboard rows to print")
+    parser.add_argument("--json", help="Write the full leaderboard to this file")
+    return parser.parse_args(argv)
+
+def load_dataset(path, geo_mode, anomalous_rows=None, cache_dir=FEATURE_CACHE_DIR):
+    """Scaled training matrix plus 0/1 anomaly labels aligned with its rows."""
+    raw = pd.read_csv(path, usecols=["userID"])
+    if anomalous_rows is None:
+        anomalous_rows = raw["userID"].nunique()
+    labels = np.zeros(len(raw), dtype=np.int8)
+    labels[len(raw) - anomalous_rows:] = 1
+
+    # The feature table's index holds the original CSV row numbers
+    table, _ = load_features(path, geo_mode, LOGIN_TIME_FORMAT, cache_dir)
+    X = MinMaxScaler().fit_transform(table.features)
+    return X, labels[table.index]
+
+# Worker-side view of the shared feature matrix, attached once per process
+_shared = {}
+
+def _attach(name, shape, dtype):
+    shm = shared_memory.SharedMemory(name=name)
+    _shared["shm"] = shm
+    _shared["X"] = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+
+def evaluate(config, labels, n_jobs, latency_rows):
+    X = _shared["X"]
+    iso_forest = IsolationForest(
+        n_estimators=config["n_estimators"], max_samples=config["max_samples"],
+        contamination=config["contamination"], random_state=config["seed"], n_jobs=n_jobs
+    )
+    start = time.perf_counter()
+    iso_forest.fit(X)
+    fit_seconds = time.perf_counter() - start
+
+    # Serving scores with the flat forest, so time that engine
+    flat = FlatForest.from_sklearn(iso_forest)
+    start = time.perf_counter()
+    decision = flat.decision_function(X)
+    batch_seconds = time.perf_counter() - start
+    rows = X[np.arange(latency_rows) % len(X)]
+    start = time.perf_counter()
+    for i in range(len(rows)):
+        flat.decision_function(rows[i:i + 1])
+    single_seconds = (time.perf_counter() - start) / len(rows)
+
+    predicted = (decision < 0).astype(np.int8)
+    precision, recall, f1, _ = precision_recall_fscore_support(labels, predicted, average="binary", zero_division=0)
+    return dict(config,
+                fit_seconds=fit_seconds,
+                batch_us_per_row=batch_seconds / len(X) * 1e6,
+                single_row_us=single_seconds * 1e6,
+                roc_auc=roc_auc_score(labels, -decision),
+                average_precision=average_precision_score(labels, -decision),
+                precision=precision, recall=recall, f1=f1,
+                flagged=int(predicted.sum()))
+
+def run_sweep(X, labels, configs, workers=None, n_jobs=1, latency_rows=200):
+    shm = shared_memory.SharedMemory(create=True, size=X.nbytes)
+    try:
+        np.ndarray(X.shape, dtype=X.dtype, buffer=shm.buf)[:] = X
+        results = []
+        with ProcessPoolExecutor(max_workers=workers, initializer=_attach,
+                                 initargs=(shm.name, X.shape, X.dtype.str)) as pool:
+            futures = [pool.submit(evaluate, config, labels, n_jobs, latency_rows) for config in configs]
+            for future in as_completed(futures):
+                results.append(future.result())
+        return sorted(results, key=lambda r: (-r["roc_auc"], -r["f1"], r["fit_seconds"]))
+    finally:
+        shm.close()
+        shm.unlink()
+
+def print_leaderboard(results, top):
+    print(f"{'contam':>7} {'trees':>6} {'samples':>8} {'fit s':>7} {'batch µs/row':>13} {'1-row µs':>9} "
+          f"{'ROC AUC':>8} {'AP':>6} {'prec':>6} {'recall':>7} {'F1':>6}")
+    for r in results[:top]:
+        print(f"{r['contamination']:>7g} {r['n_estimators']:>6} {str(r['max_samples']):>8} {r['fit_seconds']:>7.3f} "
+              f"{r['batch_us_per_row']:>13.2f} {r['single_row_us']:>9.1f} {r['roc_auc']:>8.4f} "
+              f"{r['average_precision']:>6.3f} {r['precision']:>6.3f} {r['recall']:>7.3f} {r['f1']:>6.3f}")
+
+def main(argv=None):
+    args = parse_args(argv)
+    X, labels = load_dataset(args.input, args.geo_mode, args.anomalous_rows, args.feature_cache)
+    print(f"✅ Features built. Rows: {len(X)}, labelled anomalies: {int(labels.sum())}")
+
+    configs = [
+        {"contamination": c, "n_estimators": n, "max_samples": m, "seed": args.seed}
+        for c, n, m in itertools.product(args.contamination, args.n_estimators, args.max_samples)
+    ]
+    start = time.perf_counter()
+    results = run_sweep(X, labels, configs, args.workers, args.n_jobs, args.latency_rows)
+    print(f"✅ {len(configs)} configurations evaluated in {time.perf_counter() - start:.1f}s")
+    print_leaderboard(results, args.top)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"input": args.input, "rows": len(X), "anomalies": int(labels.sum()), "results": results}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
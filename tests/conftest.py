@@ -0,0 +1,59 @@
+import csv
+import importlib.util
+import itertools
+import os
+import random
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+_app_modules = itertools.count()
+
+def login_events(count=200, seed=1):
+    """Logins from the sample activity file, with users seen more than once and
+    a timezone switch now and then so every decision comes up."""
+    with open(os.path.join(ROOT, "useractivityvariation5.csv"), newline="") as f:
+        rows = list(csv.DictReader(f))
+    rng = random.Random(seed)
+    events = [dict(row) for row in rng.sample(rows, count)]
+    for event in events:
+        if rng.random() < 0.5:
+            event["Timezone"] = "Asia/Tokyo"
+    return events + [dict(event) for event in events[:count // 4]]
+
+def import_fresh(filename, monkeypatch, env):
+    """A new copy of the module in `filename`, imported with `env` set."""
+    for key, value in env.items():
+        monkeypatch.setenv(key, str(value))
+    spec = importlib.util.spec_from_file_location(f"{filename[:-3]}_under_test_{next(_app_modules)}", os.path.join(ROOT, filename))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+@pytest.fixture
+def load_app(tmp_path, monkeypatch):
+    """load_app(**env) imports a fresh copy of app.py configured by `env`, on
+    its own SQLite database under tmp_path, and stops its workers afterwards."""
+    loaded = []
+
+    def load(**env):
+        env = dict({"DATABASE_URL": f"sqlite:///{tmp_path}/db-{len(loaded)}.sqlite",
+                    "MODEL_BUNDLE_PATH": os.path.join(ROOT, "model_bundle.ifb"),
+                    "USER_PROFILES_PATH": ""}, **env)
+        module = import_fresh("app.py", monkeypatch, env)
+        loaded.append(module)
+        with module.app.app_context():
+            module.db.create_all()
+        return module
+
+    yield load
+    for module in loaded:
+        module.stop_background_workers()
+        with module.app.app_context():
+            module.db.engine.dispose()
+
+def decisions(results):
+    """What a caller acts on: the decision, why, and the history features."""
+    return [(r.get("risk_decision"), r.get("changed_features"), r.get("history")) for r in results]
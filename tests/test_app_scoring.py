@@ -0,0 +1,64 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from conftest import decisions, login_events
+
+def post_each(service, events):
+    client = service.app.test_client()
+    return [client.post("/predict", json=event).get_json() for event in events]
+
+def test_predict_batch_matches_one_request_per_login(load_app):
+    events = login_events()
+    expected = post_each(load_app(LAST_LOGIN_CACHE_SIZE=0), events)
+    assert {r["risk_decision"] for r in expected} == {"Allow", "MFA", "Block"}
+
+    service = load_app(LAST_LOGIN_CACHE_SIZE=0)
+    results = service.app.test_client().post("/predict_batch", json={"events": events}).get_json()["results"]
+    assert decisions(results) == decisions(expected)
+    with service.app.app_context():
+        allowed = sum(r["risk_decision"] == "Allow" for r in expected)
+        assert service.LoginAttempt.query.count() == allowed
+
+def test_last_login_cache_keeps_the_uncached_decisions(load_app):
+    events = login_events()
+    expected = post_each(load_app(LAST_LOGIN_CACHE_SIZE=0), events)
+
+    # Small enough that users are evicted and reloaded from the database
+    service = load_app(LAST_LOGIN_CACHE_SIZE=16)
+    assert decisions(post_each(service, events)) == decisions(expected)
+    stats = service.last_login_cache.stats()
+    assert stats["hits"] > 0 and stats["evictions"] > 0
+
+def test_write_behind_keeps_the_synchronous_decisions_and_rows(load_app):
+    events = login_events()
+    expected_app = load_app(LAST_LOGIN_CACHE_SIZE=0)
+    expected = post_each(expected_app, events)
+
+    # Without the cache, previous logins still queued must come from the queue
+    service = load_app(LAST_LOGIN_CACHE_SIZE=0, WRITE_BEHIND_ENABLED=1, WRITE_BEHIND_BATCH_SIZE=8)
+    assert decisions(post_each(service, events)) == decisions(expected)
+    assert service.write_queue.drain()
+    assert service.write_queue.stats()["dropped"] == 0
+
+    def rows(module):
+        with module.app.app_context():
+            return sorted((a.userID, a.IPaddress, a.Timezone, a.DeviceInfo) for a in module.LoginAttempt.query)
+    assert rows(service) == rows(expected_app)
+
+def test_micro_batcher_keeps_the_per_request_decisions(load_app):
+    events = login_events()
+    expected = post_each(load_app(LAST_LOGIN_CACHE_SIZE=0), events)
+
+    # Concurrent clients, each sending its own users' logins in order
+    service = load_app(LAST_LOGIN_CACHE_SIZE=0, MICRO_BATCH_ENABLED=1, MICRO_BATCH_MAX_WAIT=0.01)
+    clients = 4
+    users = {userID: k % clients for k, userID in enumerate(dict.fromkeys(event["userID"] for event in events))}
+    positions = [[i for i, event in enumerate(events) if users[event["userID"]] == k] for k in range(clients)]
+    with ThreadPoolExecutor(clients) as pool:
+        parts = list(pool.map(lambda part: post_each(service, [events[i] for i in part]), positions))
+    results = [None] * len(events)
+    for part, part_results in zip(positions, parts):
+        for i, result in zip(part, part_results):
+            results[i] = result
+    assert decisions(results) == decisions(expected)
+    stats = service.micro_batcher.stats()
+    assert stats["items"] == len(events) and stats["failures"] == 0
@@ -0,0 +1,66 @@
+import asyncio
+import os
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("quart")
+pytest.importorskip("aiosqlite")
+from conftest import ROOT, import_fresh, login_events
+
+BACKGROUND_THREADS = {"micro-batcher", "model-watch", "profile-autosave"}
+
+def background_threads():
+    return {thread.name for thread in threading.enumerate() if thread.is_alive()} & BACKGROUND_THREADS
+
+def test_background_threads_run_only_while_serving(tmp_path, monkeypatch):
+    profiles_path = tmp_path / "user_profiles.npz"
+    service = import_fresh("asgi_app.py", monkeypatch, {
+        "ASYNC_DATABASE_URL": f"sqlite+aiosqlite:///{tmp_path / 'db.sqlite'}",
+        "MODEL_BUNDLE_PATH": os.path.join(ROOT, "model_bundle.ifb"),
+        "USER_PROFILES_PATH": profiles_path,
+        "USER_PROFILES_SAVE_INTERVAL": 60,
+        "MICRO_BATCH_ENABLED": 1,
+        "MODEL_WATCH_INTERVAL": 60
+    })
+    assert background_threads() == set() and service.scoring_pool is None
+
+    async def serve():
+        async with service.app.test_app() as test_app:
+            assert background_threads() == BACKGROUND_THREADS
+            response = await test_app.test_client().post("/predict", json=login_events(4)[0])
+            assert (await response.get_json())["risk_decision"] in ("Allow", "MFA", "Block")
+
+    asyncio.run(serve())
+    deadline = time.monotonic() + 5
+    while background_threads() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert background_threads() == set()
+    assert profiles_path.exists()
+
+def test_workers_reread_the_history_other_workers_extend(tmp_path, monkeypatch):
+    service = import_fresh("asgi_app.py", monkeypatch, {
+        "ASYNC_DATABASE_URL": f"sqlite+aiosqlite:///{tmp_path / 'db.sqlite'}",
+        "MODEL_BUNDLE_PATH": os.path.join(ROOT, "model_bundle.ifb"),
+        "USER_PROFILES_PATH": "",
+        "WORKER_PROCESSES": 2
+    })
+    assert service.last_login_cache.maxsize == 0
+    event = login_events(4)[0]
+
+    async def serve():
+        async with service.app.test_app() as test_app:
+            client = test_app.test_client()
+            await client.post("/mfa_confirmed", json=event)
+            # Loads the user's history into this worker
+            await client.post("/predict", json=event)
+            # Another worker records a login of the same user
+            async with service.engine.begin() as conn:
+                await conn.execute(service.insert(service.login_attempts), [service.attempt_row(service.parse_login(event), 0.0)])
+                logins = len((await conn.execute(service.select(service.login_attempts.c.id))).all())
+            response = await client.post("/predict", json=event)
+            return logins, (await response.get_json())["history"]
+
+    logins, history = asyncio.run(serve())
+    assert history["logins_24h"] == logins
@@ -0,0 +1,26 @@
+import os
+import sys
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from calibration import Calibration
+
+def test_remapped_keeps_decisions_of_the_same_logins():
+    rng = np.random.default_rng(0)
+    old_scores = rng.normal(-0.08, 0.05, size=5000)
+    # A refit forest ranks the logins much the same, on a shifted, stretched scale
+    new_scores = 1.5 * old_scores + 0.03 + rng.normal(0, 0.002, size=len(old_scores))
+    calibration = Calibration.fit(old_scores, old_scores)
+    remapped = calibration.remapped(old_scores, new_scores)
+
+    assert remapped.allow_threshold < remapped.mfa_threshold
+    agreement = np.mean(calibration.decisions(old_scores) == remapped.decisions(new_scores))
+    assert agreement > 0.97
+    assert np.allclose(np.sort(remapped.percentile_ranks(new_scores)), np.sort(calibration.percentile_ranks(old_scores)), atol=0.5)
+
+def test_remapped_shifts_values_beyond_the_logins():
+    old_scores = np.linspace(-0.1, 0.1, 201)
+    calibration = Calibration(-0.2, 0.15)
+    remapped = calibration.remapped(old_scores, old_scores + 0.05)
+    assert np.isclose(remapped.allow_threshold, -0.15)
+    assert np.isclose(remapped.mfa_threshold, 0.2)
@@ -0,0 +1,46 @@
+import os
+import sys
+import numpy as np
+from sklearn.ensemble import IsolationForest
+from sklearn.preprocessing import MinMaxScaler
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from calibration import Calibration
+from encoding import CategoryLookup
+from forest_engine import FlatForest
+from model_bundle import FEATURE_COLUMNS, load_bundle, write_bundle
+
+def training_rows(n=2000, seed=0):
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(n, len(FEATURE_COLUMNS)))
+    X[: n // 20] += rng.normal(4.0, 1.0, size=(n // 20, len(FEATURE_COLUMNS)))
+    return X
+
+def test_flat_forest_matches_sklearn():
+    X = training_rows()
+    iso_forest = IsolationForest(n_estimators=50, contamination=0.14, random_state=42).fit(X)
+    flat = FlatForest.from_sklearn(iso_forest)
+    probe = np.vstack([X, training_rows(500, seed=1) * 3.0])
+
+    np.testing.assert_allclose(flat.score_samples(probe), iso_forest.score_samples(probe), rtol=0, atol=1e-12)
+    np.testing.assert_allclose(flat.decision_function(probe), iso_forest.decision_function(probe), rtol=0, atol=1e-12)
+    np.testing.assert_array_equal(flat.predict(probe), iso_forest.predict(probe))
+
+def test_bundle_round_trip_scores_like_the_fitted_model(tmp_path):
+    X = training_rows()
+    scaler = MinMaxScaler().fit(X)
+    iso_forest = IsolationForest(n_estimators=50, contamination=0.14, random_state=42).fit(scaler.transform(X))
+    scores = -iso_forest.decision_function(scaler.transform(X))
+    calibration = Calibration.fit(scores, scores)
+    ip_frequencies = {"10.0.0.1": 0.25, "10.0.0.2": 0.75}
+    path = str(tmp_path / "model.ifb")
+    encoders = {"Timezone": CategoryLookup(["Europe/London", "UTC"]), "DeviceInfo": CategoryLookup(["Mac", "Windows"])}
+    write_bundle(path, iso_forest, scaler, encoders, ip_frequencies, meta={"trained_at": "test"}, calibration=calibration)
+
+    model = load_bundle(path)
+    np.testing.assert_allclose(model.risk_scores(X), scores, rtol=0, atol=1e-12)
+    assert model.ip_frequency_table.get("10.0.0.2") == 0.75
+    assert model.ip_frequency_table.get("10.0.0.3") is None
+    assert model.calibration.allow_threshold == calibration.allow_threshold
+    assert model.calibration.mfa_threshold == calibration.mfa_threshold
+    assert model.meta["trained_at"] == "test"
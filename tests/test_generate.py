@@ -0,0 +1,20 @@
+import os
+import sys
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "DataGenScripts"))
+from generate import COLUMNS, main
+
+def test_parquet_output_matches_csv(tmp_path):
+    pytest.importorskip("pyarrow")
+    csv_path, parquet_path = str(tmp_path / "out.csv"), str(tmp_path / "out.parquet")
+    for path in (csv_path, parquet_path):
+        main(["--users", "40", "--shard-users", "15", "--workers", "1", "--output", path])
+
+    parquet = pd.read_parquet(parquet_path)
+    csv = pd.read_csv(csv_path)
+    assert list(parquet.columns) == COLUMNS
+    assert len(parquet) == len(csv) == 40 * 7
+    assert parquet["userID"].tolist() == csv["userID"].tolist()
+    assert not os.path.exists(parquet_path + ".parts")
@@ -0,0 +1,38 @@
+import os
+import sys
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ip_sketch import IPFrequencySketch
+
+DAY = 86400.0
+# March 2025, as in the training data
+TRAINING_START = 1740787200.0
+
+def trained_sketch():
+    rng = np.random.default_rng(0)
+    ips = [f"10.{i % 7}.{i % 13}.{i % 50}" for i in rng.integers(0, 5000, size=2000)]
+    when = TRAINING_START + np.sort(rng.uniform(0, 31 * DAY, size=len(ips)))
+    sketch = IPFrequencySketch(width=1 << 12, half_life=30 * DAY)
+    sketch.update_many(ips, when)
+    return sketch, sorted(set(ips))
+
+def test_live_update_barely_moves_existing_frequencies():
+    sketch, known = trained_sketch()
+    before = sketch.get_many(known)
+
+    # A live login at wall-clock time, long after the training data
+    sketch.update("192.0.2.1", TRAINING_START + 600 * DAY, advance=False)
+
+    after = sketch.get_many(known)
+    assert np.allclose(after, before, rtol=0.01)
+    assert sketch.get("192.0.2.1") < 2 * before.max()
+    assert abs(sketch.get(known[0]) - after[0]) < 1e-12
+
+def test_refresh_updates_still_decay_old_counts():
+    sketch, known = trained_sketch()
+    before = sketch.get_many(known)
+
+    sketch.update_many(["192.0.2.1"] * 100, TRAINING_START + 60 * DAY)
+
+    assert sketch.get_many(known).max() < before.max()
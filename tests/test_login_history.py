@@ -0,0 +1,35 @@
+import os
+import sys
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from login_history import LoginHistory, history_features
+
+def test_offline_history_matches_serving_replay():
+    rng = np.random.default_rng(0)
+    n = 3000
+    users = rng.integers(0, 200, n).astype(str)
+    # Ten-minute steps over five days, so the 24 h window and ties both occur
+    seconds = 1.74e9 + np.round(rng.uniform(0, 5 * 86400, n) / 600) * 600
+    seconds[rng.random(n) < 0.01] = np.nan
+    devices = rng.choice(["Windows", "Mac", "iPhone", "Android"], n)
+    timezones = rng.choice(["Europe/London", "Asia/Tokyo", "America/New_York"], n)
+
+    offline = history_features(users, seconds, devices, timezones, capacity=5)
+
+    history = LoginHistory(capacity=5, shards=4)
+    order = np.lexsort((seconds, users))
+    for i in order[~np.isnan(seconds[order])]:
+        assert tuple(offline[i]) == history.features(users[i], seconds[i], devices[i], timezones[i])
+        history.record(users[i], seconds[i], devices[i], timezones[i])
+    assert not offline[np.isnan(seconds)].any()
+
+def test_values_past_the_cap_are_not_interned():
+    history = LoginHistory(capacity=5, shards=1, max_values=3)
+    for i in range(100):
+        history.record("u", 1000.0 + i, f"device-{i}", "UTC")
+    assert history.stats()["interned_values"] == 3
+    assert history.stats()["uninterned_values"] == 98
+    # An uninterned device never counts as one the user already used
+    assert history.features("u", 2000.0, "device-99", "UTC").new_device == 1
+    assert history.features("u", 2000.0, "device-99", "UTC") == tuple(history.features_many(["u"], [2000.0], ["device-99"], ["UTC"])[0])
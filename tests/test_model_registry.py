@@ -0,0 +1,47 @@
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from model_registry import ModelRegistry
+
+class StubModel:
+    ip_frequency_table = {}
+
+    def __init__(self, version):
+        self.version = version
+
+    def risk_scores(self, features):
+        return np.zeros(len(features))
+
+def test_watch_retries_a_bundle_that_failed_to_load(tmp_path):
+    path = tmp_path / "model_bundle.ifb"
+    path.write_bytes(b"v1")
+
+    def loader(source):
+        data = open(source or path, "rb").read()
+        if data.endswith(b"partial"):
+            raise ValueError("truncated bundle")
+        return StubModel(data)
+
+    registry = ModelRegistry(loader)
+    assert registry.reload(background=False)
+    registry.watch(str(path), interval=0.01)
+    time.sleep(0.1)  # let the watcher take the first version's signature
+
+    # The watcher sees the file while it is still being written, then finished
+    path.write_bytes(b"v2 partial")
+    deadline = time.monotonic() + 5
+    while registry.last_error is None and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert registry.current.version == b"v1"
+    assert not registry.reload(str(path), background=False)
+
+    os.truncate(path, 2)
+    deadline = time.monotonic() + 5
+    while registry.current.version != b"v2" and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert registry.current.version == b"v2" and registry.last_error is None
+    registry.unwatch()
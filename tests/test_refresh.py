@@ -0,0 +1,34 @@
+import os
+import sys
+
+import pandas as pd
+from sqlalchemy import create_engine, text
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from refresh import read_new_rows
+
+def insert(engine, ids):
+    with engine.begin() as conn:
+        for i in ids:
+            conn.execute(text("INSERT INTO login_attempts VALUES (:id, '10.0.0.1', 0, 0, 100, 1000, 0, '2025-03-19 09:45:12')"),
+                         {"id": i})
+
+def read_ids(engine, last_id, recent_ids, overlap=5):
+    chunks = list(read_new_rows(engine, last_id, recent_ids, overlap, batch_size=2))
+    return pd.concat(chunks)["id"].tolist() if chunks else []
+
+def test_rows_committed_below_the_checkpoint_are_read_once(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'db.sqlite'}")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE login_attempts (id INTEGER PRIMARY KEY, IPaddress TEXT, Latitude REAL, Longitude REAL, "
+                          "TypingSpeed REAL, MouseSpeed REAL, geo_velocity REAL, LoginTime TEXT)"))
+    # Id 3 was handed out first but its transaction commits after the run
+    insert(engine, [1, 2, 4, 5])
+    assert read_ids(engine, 0, None) == [1, 2, 4, 5]
+    insert(engine, [3, 6])
+    assert read_ids(engine, 5, [1, 2, 4, 5]) == [3, 6]
+    assert read_ids(engine, 6, [1, 2, 3, 4, 5, 6]) == []
+
+    # Checkpoints from before the overlap trust last_id
+    assert read_ids(engine, 5, None) == [6]
+    engine.dispose()
@@ -0,0 +1,54 @@
+import json
+
+from conftest import decisions, login_events
+from stream_consumer import JsonlSink, JsonlSource, StreamConsumer
+
+def consume(service, input_path, output_path, checkpoint_path, stop_after=None):
+    """Run a consumer over the file with `service`'s score_logins, stopping
+    after `stop_after` batches as a shutdown would."""
+    consumer = None
+
+    def score(logins):
+        if stop_after is not None and consumer.counts["batches"] + 1 >= stop_after:
+            consumer.stop()
+        with service.app.app_context():
+            return service.score_logins(logins)
+
+    source = JsonlSource(str(input_path))
+    sink = JsonlSink(str(output_path))
+    consumer = StreamConsumer(source, sink, score, checkpoint_path=str(checkpoint_path),
+                              batch_size=32, event_time=True, poll_timeout=0.1)
+    try:
+        return consumer.run()
+    finally:
+        source.close()
+        sink.close()
+
+def read_records(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+def test_resume_from_checkpoint_matches_an_uninterrupted_run(load_app, tmp_path):
+    # A replay in time order, so the history reloaded after a restart is the one kept in memory
+    events = sorted(login_events(), key=lambda event: event["LoginTime"])
+    input_path = tmp_path / "events.jsonl"
+    input_path.write_text("".join(json.dumps(event) + "\n" for event in events))
+
+    full = consume(load_app(USER_PROFILES_ENABLED=0), input_path, tmp_path / "full.jsonl", tmp_path / "full.json")
+    expected = read_records(tmp_path / "full.jsonl")
+    assert full["scored"] == len(events) and len(expected) == len(events)
+    assert {r["risk_decision"] for r in expected} == {"Allow", "MFA", "Block"}
+
+    first = load_app(USER_PROFILES_ENABLED=0)
+    stopped = consume(first, input_path, tmp_path / "resumed.jsonl", tmp_path / "resumed.json", stop_after=3)
+    assert stopped["batches"] == 3 and 0 < stopped["offset"] < input_path.stat().st_size
+    assert json.loads((tmp_path / "resumed.json").read_text())["offset"] == stopped["offset"]
+
+    # A restarted process: same database and checkpoint, empty caches
+    restarted = load_app(USER_PROFILES_ENABLED=0, DATABASE_URL=first.app.config["SQLALCHEMY_DATABASE_URI"])
+    resumed = consume(restarted, input_path, tmp_path / "resumed.jsonl", tmp_path / "resumed.json")
+    assert stopped["scored"] + resumed["scored"] == len(events)
+
+    records = read_records(tmp_path / "resumed.jsonl")
+    assert [r["offset"] for r in records] == [r["offset"] for r in expected]
+    assert decisions(records) == decisions(expected)
@@ -0,0 +1,46 @@
+import logging
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from write_behind import WriteBehindQueue
+
+def make_queue(flush_fn, logger):
+    return WriteBehindQueue(flush_fn, key_fn=lambda row: row["userID"], batch_size=10, flush_interval=0.001,
+                            max_retries=2, logger=logger).start()
+
+def test_poison_row_is_dropped_and_the_rest_flushed(caplog):
+    written = []
+
+    def flush(rows):
+        if any(row["userID"] == "bad" for row in rows):
+            raise ValueError("constraint violated")
+        written.extend(rows)
+
+    queue = make_queue(flush, logging.getLogger("write-behind-test"))
+    queue.submit([{"userID": f"u{i}"} for i in range(5)] + [{"userID": "bad"}] + [{"userID": f"v{i}"} for i in range(5)])
+    assert queue.drain(timeout=10.0)
+    queue.stop()
+
+    assert sorted(row["userID"] for row in written) == sorted([f"u{i}" for i in range(5)] + [f"v{i}" for i in range(5)])
+    stats = queue.stats()
+    assert stats["dropped"] == 1 and stats["depth"] == 0
+    assert queue.pending("bad") is None
+    assert "dropped 1 rows" in caplog.text and "constraint violated" in caplog.text
+
+def test_transient_failure_is_retried_in_order():
+    written, failures = [], [2]
+
+    def flush(rows):
+        if failures[0]:
+            failures[0] -= 1
+            raise ConnectionError("database restarting")
+        written.extend(rows)
+
+    queue = make_queue(flush, None)
+    rows = [{"userID": f"u{i}"} for i in range(8)]
+    queue.submit(rows)
+    assert queue.drain(timeout=10.0)
+    queue.stop()
+    assert written == rows
+    assert queue.stats()["dropped"] == 0 and queue.stats()["flush_failures"] == 2
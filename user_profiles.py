@@ -0,0 +1,271 @@
+"""Per-user behavioural baselines: running mean/variance of TypingSpeed and
+MouseSpeed (Welford) and a 24-bin login-hour histogram per userID.
+
+Each profile is one row of a few arrays (136 bytes a user), updated in O(1)
+on every accepted login. A login is scored against the user's own history
+instead of everyone's distribution.
+
+Build or refresh the file from history. It goes to default_profiles_path(),
+where the service looks, unless --output (and USER_PROFILES_PATH) say otherwise:
+    python user_profiles.py --csv useractivityvariation5.csv
+    python user_profiles.py --database-url mysql+mysqlconnector://...
+"""
+import argparse
+import os
+import threading
+import zlib
+from collections import namedtuple
+import numpy as np
+import pandas as pd
+
+# How a login compares with the user's own baseline. typing_z / mouse_z are
+# None until the user has PROFILE_MIN_LOGINS logins; hour_share is the share
+# of their logins within an hour of this one's (circular).
+ProfileScores = namedtuple("ProfileScores", ["logins", "typing_z", "mouse_z", "hour_share"])
+
+PROFILE_MIN_LOGINS = 3
+# Floors on the standard deviation, so a perfectly steady user does not turn
+# every small change into a huge z-score
+MIN_TYPING_STD = 1.0
+MIN_MOUSE_STD = 10.0
+
+# Columns of the moments array
+TYPING_MEAN, TYPING_M2, MOUSE_MEAN, MOUSE_M2 = range(4)
+
+def default_profiles_path():
+    """user_profiles.npz in DATA_DIR (default: data/ next to this module),
+    never in whatever directory the process happens to run from."""
+    data_dir = os.environ.get("DATA_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data"))
+    return os.path.join(data_dir, "user_profiles.npz")
+
+class _ProfileShard:
+    """Profiles of the users hashed to one shard. Users saved in the file
+    sit first, under their sorted keys; users seen since then follow,
+    indexed by a dict."""
+
+    def __init__(self, keys=None, counts=None, moments=None, hours=None):
+        self.lock = threading.Lock()
+        self.keys = keys if keys is not None else np.array([], dtype=str)
+        self.added = {}
+        self.counts = counts if counts is not None else np.zeros(0, dtype=np.uint32)
+        self.moments = moments if moments is not None else np.zeros((0, 4))
+        self.hours = hours if hours is not None else np.zeros((0, 24), dtype=np.uint32)
+
+    def __len__(self):
+        return len(self.keys) + len(self.added)
+
+    def slot(self, userID, create):
+        if len(self.keys):
+            i = int(np.searchsorted(self.keys, userID))
+            if i < len(self.keys) and self.keys[i] == userID:
+                return i
+        slot = self.added.get(userID)
+        if slot is None and create:
+            slot = len(self)
+            if slot == len(self.counts):
+                size = max(64, 2 * slot)
+                self.counts = np.resize(self.counts, size)
+                self.moments = np.resize(self.moments, (size, 4))
+                self.hours = np.resize(self.hours, (size, 24))
+            self.counts[slot] = 0
+            self.moments[slot] = 0.0
+            self.hours[slot] = 0
+            self.added[userID] = slot
+        return slot
+
+    def snapshot(self):
+        """All profiles sorted by userID, as (keys, counts, moments, hours)."""
+        with self.lock:
+            n = len(self)
+            keys = np.concatenate([self.keys, np.array(list(self.added), dtype=str)])
+            counts, moments, hours = self.counts[:n].copy(), self.moments[:n].copy(), self.hours[:n].copy()
+        order = np.argsort(keys, kind="stable")
+        return keys[order], counts[order], moments[order], hours[order]
+
+class UserProfiles:
+    """Per-user profiles sharded by crc32(userID), with one lock per shard.
+
+    Unlike LoginHistory this is not a cache: profiles are never evicted, and
+    save() / load() persist them to one uncompressed .npz file. Loading reads
+    the arrays straight in; there is no per-user dict to rebuild.
+    """
+
+    def __init__(self, shards=16):
+        self._shards = [_ProfileShard() for _ in range(shards)]
+        self._autosave_stop = None
+
+    def _shard(self, userID):
+        return self._shards[zlib.crc32(str(userID).encode("utf-8")) % len(self._shards)]
+
+    def __contains__(self, userID):
+        shard = self._shard(userID)
+        with shard.lock:
+            return shard.slot(str(userID), create=False) is not None
+
+    def record(self, userID, typing_speed, mouse_speed, hour):
+        """Fold one accepted login into the user's profile."""
+        shard = self._shard(userID)
+        with shard.lock:
+            slot = shard.slot(str(userID), create=True)
+            n = int(shard.counts[slot]) + 1
+            shard.counts[slot] = n
+            moments = shard.moments[slot]
+            for mean, m2, value in ((TYPING_MEAN, TYPING_M2, typing_speed), (MOUSE_MEAN, MOUSE_M2, mouse_speed)):
+                delta = value - moments[mean]
+                moments[mean] += delta / n
+                moments[m2] += delta * (value - moments[mean])
+            shard.hours[slot, int(hour) % 24] += 1
+
+    def scores(self, userID, typing_speed, mouse_speed, hour):
+        shard = self._shard(userID)
+        with shard.lock:
+            slot = shard.slot(str(userID), create=False)
+            if slot is None:
+                return ProfileScores(0, None, None, None)
+            n = int(shard.counts[slot])
+            moments = shard.moments[slot].copy()
+            hours = shard.hours[slot].copy()
+        hour = int(hour) % 24
+        hour_share = float(hours[[(hour - 1) % 24, hour, (hour + 1) % 24]].sum() / n) if n else None
+        if n < PROFILE_MIN_LOGINS:
+            return ProfileScores(n, None, None, hour_share)
+        typing_std = max(np.sqrt(moments[TYPING_M2] / (n - 1)), MIN_TYPING_STD)
+        mouse_std = max(np.sqrt(moments[MOUSE_M2] / (n - 1)), MIN_MOUSE_STD)
+        return ProfileScores(
+            n,
+            float((typing_speed - moments[TYPING_MEAN]) / typing_std),
+            float((mouse_speed - moments[MOUSE_MEAN]) / mouse_std),
+            hour_share
+        )
+
+    def save(self, path):
+        arrays = {}
+        for k, shard in enumerate(self._shards):
+            keys, counts, moments, hours = shard.snapshot()
+            arrays.update({f"{k}.keys": keys, f"{k}.counts": counts, f"{k}.moments": moments, f"{k}.hours": hours})
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = f"{path}.tmp.npz"
+        np.savez(tmp_path, **arrays)
+        os.replace(tmp_path, path)
+
+    def autosave(self, path, interval=60.0):
+        """Save to `path` every `interval` seconds in a daemon thread, until
+        stop_autosave()."""
+        self.stop_autosave()
+        stop = self._autosave_stop = threading.Event()
+
+        def run():
+            while not stop.wait(interval):
+                try:
+                    self.save(path)
+                except OSError:
+                    pass
+
+        thread = threading.Thread(target=run, name="profile-autosave", daemon=True)
+        thread.start()
+        return thread
+
+    def stop_autosave(self):
+        if self._autosave_stop is not None:
+            self._autosave_stop.set()
+            self._autosave_stop = None
+
+    @classmethod
+    def load(cls, path):
+        """Profiles saved by save(); the file fixes the shard count."""
+        with np.load(path, allow_pickle=False) as data:
+            shards = len({name.split(".")[0] for name in data.files})
+            profiles = cls(shards)
+            profiles._shards = [
+                _ProfileShard(data[f"{k}.keys"], data[f"{k}.counts"], data[f"{k}.moments"], data[f"{k}.hours"])
+                for k in range(shards)
+            ]
+        return profiles
+
+    @classmethod
+    def from_frame(cls, frame, shards=16):
+        """Profiles from a profile_frame() result."""
+        profiles = cls(shards)
+        users = frame.index.astype(str).to_numpy()
+        owner = np.fromiter((zlib.crc32(user.encode("utf-8")) % shards for user in users), dtype=np.int64, count=len(users))
+        counts = frame["count"].to_numpy(dtype=np.uint32)
+        moments = frame[["typing_mean", "typing_m2", "mouse_mean", "mouse_m2"]].to_numpy(dtype=np.float64)
+        hours = frame[[f"h{h}" for h in range(24)]].to_numpy(dtype=np.uint32)
+        for k in range(shards):
+            mine = np.flatnonzero(owner == k)
+            mine = mine[np.argsort(users[mine], kind="stable")]
+            profiles._shards[k] = _ProfileShard(users[mine].astype(str), counts[mine], moments[mine], hours[mine])
+        return profiles
+
+    def stats(self):
+        users = sum(len(shard) for shard in self._shards)
+        return {"users": users, "shards": len(self._shards)}
+
+def profile_frame(df):
+    """Profile columns per userID for a frame of logins (userID, TypingSpeed,
+    MouseSpeed and a datetime LoginTime)."""
+    grouped = df.assign(userID=df["userID"].astype(str)).groupby("userID", sort=False)
+    frame = pd.DataFrame({
+        "count": grouped.size(),
+        "typing_mean": grouped["TypingSpeed"].mean(),
+        "typing_m2": grouped["TypingSpeed"].var(ddof=0) * grouped.size(),
+        "mouse_mean": grouped["MouseSpeed"].mean(),
+        "mouse_m2": grouped["MouseSpeed"].var(ddof=0) * grouped.size()
+    })
+    hours = pd.crosstab(df["userID"].astype(str), df["LoginTime"].dt.hour).reindex(index=frame.index, columns=range(24), fill_value=0)
+    frame[[f"h{h}" for h in range(24)]] = hours.to_numpy()
+    return frame
+
+def merge_profile_frames(a, b):
+    """Combine the profiles of two disjoint sets of logins (Chan et al.'s
+    parallel update of the mean and M2)."""
+    a, b = a.align(b, fill_value=0)
+    n = a["count"] + b["count"]
+    merged = a + b
+    merged["count"] = n
+    safe_n = n.where(n > 0, 1)
+    for col in ("typing", "mouse"):
+        delta = b[f"{col}_mean"] - a[f"{col}_mean"]
+        merged[f"{col}_mean"] = a[f"{col}_mean"] + delta * b["count"] / safe_n
+        merged[f"{col}_m2"] = a[f"{col}_m2"] + b[f"{col}_m2"] + delta ** 2 * a["count"] * b["count"] / safe_n
+    return merged
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Build the per-user profile file from login history.")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--csv", help="Login CSV in the useractivityvariation5.csv schema")
+    source.add_argument("--database-url", help="Read accepted logins from login_attempts")
+    parser.add_argument("--output", default=default_profiles_path())
+    parser.add_argument("--shards", type=int, default=16)
+    parser.add_argument("--chunksize", type=int, default=200000)
+    parser.add_argument("--time-format", default="%Y-%m-%d %H:%M:%S")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    columns = ["userID", "TypingSpeed", "MouseSpeed", "LoginTime"]
+    if args.csv:
+        chunks = pd.read_csv(args.csv, usecols=columns, dtype={"userID": str}, chunksize=args.chunksize)
+    else:
+        from sqlalchemy import create_engine
+        engine = create_engine(args.database_url)
+        chunks = pd.read_sql_query("SELECT userID, TypingSpeed, MouseSpeed, LoginTime FROM login_attempts", engine, chunksize=args.chunksize)
+
+    frame = None
+    rows = 0
+    for chunk in chunks:
+        chunk["LoginTime"] = pd.to_datetime(chunk["LoginTime"], format=args.time_format if args.csv else None, errors="coerce")
+        chunk = chunk.dropna()
+        if chunk.empty:
+            continue
+        rows += len(chunk)
+        part = profile_frame(chunk)
+        frame = part if frame is None else merge_profile_frames(frame, part)
+    if frame is None:
+        raise ValueError("Error: No logins to build profiles from!")
+
+    UserProfiles.from_frame(frame, args.shards).save(args.output)
+    print(f"✅ Profiles for {len(frame)} users built from {rows} logins and saved to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+import threading
+import time
+from collections import deque
+
+class QueueFull(Exception):
+    pass
+
+class WriteBehindQueue:
+    """Bounded queue of rows flushed in bulk by a background thread.
+
+    A flush happens once `batch_size` rows are waiting or the oldest row has
+    waited `flush_interval` seconds. Producers block for up to `put_timeout`
+    when `max_pending` rows are queued and then get QueueFull, so memory stays
+    bounded and the caller can fall back to a synchronous write.
+
+    Rows stay visible through `pending(key)` until their flush has committed,
+    so lookups can read their own writes before they reach the database.
+
+    A failed flush is logged and retried up to `max_retries` times, with the
+    pause doubling each time, while later rows wait behind it. After that the
+    batch's rows are flushed one at a time, so one bad row cannot hold up
+    the rest; rows that still fail are dropped, logged and counted. On stop,
+    a batch gets one attempt before that.
+    """
+
+    def __init__(self, flush_fn, key_fn, max_pending=10000, batch_size=500, flush_interval=0.05, put_timeout=0.1,
+                 max_retries=5, logger=None):
+        self._flush_fn = flush_fn
+        self._key_fn = key_fn
+        self.max_pending = max_pending
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.put_timeout = put_timeout
+        self.max_retries = max_retries
+        self._logger = logger
+
+        self._rows = deque()
+        self._in_flight = 0
+        self._latest = {}
+        self._cond = threading.Condition()
+        self._thread = None
+        self._stopping = False
+        self._draining = 0
+
+        self.enqueued = 0
+        self.flushed = 0
+        self.flushes = 0
+        self.flush_failures = 0
+        self.dropped = 0
+        self.rejected = 0
+        self.max_depth = 0
+        self.last_flush_seconds = 0.0
+        self.max_flush_seconds = 0.0
+        self.total_flush_seconds = 0.0
+
+    def start(self):
+        with self._cond:
+            if self._thread is None:
+                self._stopping = False
+                self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+                self._thread.start()
+        return self
+
+    def submit(self, rows):
+        deadline = time.monotonic() + self.put_timeout
+        with self._cond:
+            while len(self._rows) + self._in_flight + len(rows) > self.max_pending:
+                remaining = deadline - time.monotonic()
+                if self._stopping or remaining <= 0:
+                    self.rejected += len(rows)
+                    raise QueueFull(f"{len(self._rows) + self._in_flight} rows pending")
+                self._cond.wait(remaining)
+            now = time.monotonic()
+            for row in rows:
+                self._rows.append((now, row))
+                key = self._key_fn(row)
+                count, _ = self._latest.get(key, (0, None))
+                self._latest[key] = (count + 1, row)
+            self.enqueued += len(rows)
+            self.max_depth = max(self.max_depth, len(self._rows) + self._in_flight)
+            self._cond.notify_all()
+
+    def pending(self, key):
+        """Latest queued or in-flight row for `key`, or None."""
+        with self._cond:
+            entry = self._latest.get(key)
+            return entry[1] if entry else None
+
+    def depth(self):
+        with self._cond:
+            return len(self._rows) + self._in_flight
+
+    def _log_failure(self, message, *args):
+        if self._logger is not None:
+            self._logger.exception(message, *args)
+
+    def _flush_each(self, batch):
+        """Flush the rows of a failing batch one at a time; returns the rows
+        that fail on their own."""
+        failed = []
+        for row in batch:
+            try:
+                self._flush_fn([row])
+            except Exception:
+                self._log_failure("Write-behind row for %r failed on its own", self._key_fn(row))
+                failed.append(row)
+        return failed
+
+    def _run(self):
+        retries = 0
+        while True:
+            with self._cond:
+                while True:
+                    if self._rows and (self._stopping or self._draining or len(self._rows) >= self.batch_size
+                                       or time.monotonic() - self._rows[0][0] >= self.flush_interval):
+                        break
+                    if self._stopping and not self._rows:
+                        return
+                    timeout = self.flush_interval - (time.monotonic() - self._rows[0][0]) if self._rows else None
+                    self._cond.wait(timeout)
+                batch = [self._rows.popleft()[1] for _ in range(min(self.batch_size, len(self._rows)))]
+                self._in_flight = len(batch)
+
+            start = time.perf_counter()
+            dropped = []
+            try:
+                self._flush_fn(batch)
+            except Exception:
+                self._log_failure("Write-behind flush of %d rows failed (attempt %d of %d)", len(batch), retries + 1, self.max_retries + 1)
+                with self._cond:
+                    self.flush_failures += 1
+                    if retries < self.max_retries and not self._stopping:
+                        # Put the batch back in order and retry after a pause
+                        retries += 1
+                        self._in_flight = 0
+                        now = time.monotonic()
+                        self._rows.extendleft((now, row) for row in reversed(batch))
+                        # Submits notify too, so wait out the whole pause
+                        deadline = now + min(30.0, min(1.0, self.flush_interval * 10) * 2 ** (retries - 1))
+                        while not self._stopping and time.monotonic() < deadline:
+                            self._cond.wait(deadline - time.monotonic())
+                        continue
+                dropped = self._flush_each(batch) if len(batch) > 1 else batch
+            retries = 0
+            elapsed = time.perf_counter() - start
+
+            with self._cond:
+                self._in_flight = 0
+                for row in batch:
+                    key = self._key_fn(row)
+                    count, latest = self._latest[key]
+                    if count == 1:
+                        del self._latest[key]
+                    else:
+                        self._latest[key] = (count - 1, latest)
+                if dropped:
+                    self.dropped += len(dropped)
+                    if self._logger is not None:
+                        self._logger.error("Write-behind dropped %d rows (%d in total)", len(dropped), self.dropped)
+                self.flushes += 1
+                self.flushed += len(batch) - len(dropped)
+                self.last_flush_seconds = elapsed
+                self.max_flush_seconds = max(self.max_flush_seconds, elapsed)
+                self.total_flush_seconds += elapsed
+                self._cond.notify_all()
+
+    def drain(self, timeout=10.0):
+        """Flush now and wait until every row submitted so far has committed.
+        Returns False if rows are still pending after `timeout`."""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            self._draining += 1
+            self._cond.notify_all()
+            try:
+                while self._rows or self._in_flight:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0 or self._thread is None:
+                        return False
+                    self._cond.wait(remaining)
+                return True
+            finally:
+                self._draining -= 1
+
+    def stop(self, timeout=10.0):
+        """Flush everything still queued and stop the flush thread."""
+        with self._cond:
+            thread = self._thread
+            self._stopping = True
+            self._cond.notify_all()
+        if thread is not None:
+            thread.join(timeout)
+        with self._cond:
+            self._thread = None
+
+    def stats(self):
+        with self._cond:
+            return {
+                "depth": len(self._rows) + self._in_flight,
+                "max_depth": self.max_depth,
+                "max_pending": self.max_pending,
+                "enqueued": self.enqueued,
+                "flushed": self.flushed,
+                "flushes": self.flushes,
+                "flush_failures": self.flush_failures,
+                "dropped": self.dropped,
+                "rejected": self.rejected,
+                "last_flush_seconds": self.last_flush_seconds,
+                "max_flush_seconds": self.max_flush_seconds,
+                "avg_flush_seconds": self.total_flush_seconds / self.flushes if self.flushes else 0.0
+            }